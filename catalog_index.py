@@ -0,0 +1,188 @@
+"""
+Índice de búsqueda por rangos de elementos orbitales
+Se construye una vez por snapshot: calcula elementos derivados (perigeo,
+apogeo, periodo) y mantiene índices ordenados por inclinación, RAAN,
+altitud y EPOCH para responder consultas multi-predicado en milisegundos.
+"""
+
+import bisect
+import math
+import threading
+
+from orbits import derived_elements, parse_epoch
+
+# Campos numéricos indexados: nombre del parámetro -> columna
+INDEXED_FIELDS = {
+    'inclination': 'INCLINATION',
+    'raan': 'RA_OF_ASC_NODE',
+    'eccentricity': 'ECCENTRICITY',
+    'mean_motion': 'MEAN_MOTION',
+    'perigee': 'PERIGEE',
+    'apogee': 'APOGEE',
+    'period': 'PERIOD',
+    'epoch': 'EPOCH_TS'
+}
+
+# Columnas proyectables: las de extractor.filter_tle más los elementos derivados.
+# Esquema fijo para que la validación no dependa del contenido del snapshot
+SEARCH_FIELDS = frozenset([
+    'NORAD_CAT_ID', 'OBJECT_NAME', 'EPOCH', 'MEAN_MOTION', 'ECCENTRICITY', 'INCLINATION',
+    'RA_OF_ASC_NODE', 'ARG_OF_PERICENTER', 'MEAN_ANOMALY', 'BSTAR', '_source', '_type',
+    'SEMI_MAJOR_AXIS', 'PERIGEE', 'APOGEE', 'PERIOD'
+])
+
+# Columnas numéricas: se devuelven como números, no como el texto del CSV
+NUMERIC_FIELDS = ('MEAN_MOTION', 'ECCENTRICITY', 'INCLINATION', 'RA_OF_ASC_NODE',
+                  'ARG_OF_PERICENTER', 'MEAN_ANOMALY', 'BSTAR',
+                  'SEMI_MAJOR_AXIS', 'PERIGEE', 'APOGEE', 'PERIOD')
+
+# Nombres públicos de 'sort' -> columna indexada (EPOCH se ordena por EPOCH_TS)
+SORT_COLUMNS = {column: column for column in INDEXED_FIELDS.values() if column != 'EPOCH_TS'}
+SORT_COLUMNS['EPOCH'] = 'EPOCH_TS'
+SORT_COLUMNS['NORAD_CAT_ID'] = None  # Orden natural del índice
+
+DEFAULT_FIELDS = ['NORAD_CAT_ID', 'OBJECT_NAME', '_type', 'EPOCH', 'INCLINATION',
+                  'RA_OF_ASC_NODE', 'ECCENTRICITY', 'PERIGEE', 'APOGEE', 'PERIOD']
+MAX_LIMIT = 1000
+
+
+class SortedIndex:
+    """Valores ordenados de una columna con el número de fila de cada uno"""
+
+    def __init__(self, column):
+        pairs = sorted((value, row) for row, value in enumerate(column) if not math.isnan(value))
+        self.values = [value for value, _ in pairs]
+        self.rows = [row for _, row in pairs]
+
+    def range(self, low=None, high=None):
+        """Posiciones [inicio, fin) de los valores en [low, high]"""
+        start = 0 if low is None else bisect.bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect.bisect_right(self.values, high)
+        return start, max(start, end)
+
+
+class CatalogIndex:
+    """Catálogo de un snapshot en columnas con índices ordenados"""
+
+    def __init__(self, snapshot):
+        self.generation = snapshot.generation
+        self.records = []
+        for key in ('active_tle', 'debris_tle'):
+            for record in snapshot.records[key]:
+                row = dict(record)
+                try:
+                    row.update(derived_elements(record))
+                    row['EPOCH_TS'] = parse_epoch(record['EPOCH'])
+                except (KeyError, ValueError, ZeroDivisionError):
+                    pass
+                for field in NUMERIC_FIELDS:
+                    if field in row:
+                        value = _as_float(row[field])
+                        row[field] = None if math.isnan(value) else value
+                self.records.append(row)
+
+        # Orden natural por NORAD_CAT_ID
+        self.records.sort(key=lambda r: _as_float(r.get('NORAD_CAT_ID')))
+        self.columns = {
+            column: [_as_float(record.get(column)) for record in self.records]
+            for column in INDEXED_FIELDS.values()
+        }
+        self.indexes = {column: SortedIndex(values) for column, values in self.columns.items()}
+
+    def search(self, ranges, object_type=None, fields=None, sort=None, offset=0, limit=100):
+        """Buscar objetos que cumplen todos los rangos
+
+        ranges: lista de (columna, [(low, high), ...]); varios intervalos en
+        una misma columna se unen (RAAN que cruza 0°/360°). Devuelve el total
+        de coincidencias y la página pedida con las columnas proyectadas.
+        """
+        fields = fields or DEFAULT_FIELDS
+        unknown = [field for field in fields if field not in SEARCH_FIELDS]
+        if unknown:
+            raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+        if sort is not None and sort not in SORT_COLUMNS:
+            raise ValueError(f"No se puede ordenar por {sort} (válidos: {', '.join(sorted(SORT_COLUMNS))})")
+        sort = SORT_COLUMNS.get(sort)
+
+        # El predicado más selectivo genera los candidatos; el resto se
+        # comprueba directamente sobre las columnas
+        if ranges:
+            spans = []
+            for position, (column, intervals) in enumerate(ranges):
+                index = self.indexes[column]
+                bounds = [index.range(low, high) for low, high in intervals]
+                spans.append((sum(end - start for start, end in bounds), position, bounds))
+            _, driver, bounds = min(spans)
+            index = self.indexes[ranges[driver][0]]
+            candidates = [row for start, end in bounds for row in index.rows[start:end]]
+            checks = [(self.columns[column], intervals)
+                      for position, (column, intervals) in enumerate(ranges) if position != driver]
+        else:
+            candidates = range(len(self.records))
+            checks = []
+
+        matches = []
+        for row in candidates:
+            if object_type is not None and self.records[row].get('_type') != object_type:
+                continue
+            if all(_in_any(values[row], intervals) for values, intervals in checks):
+                matches.append(row)
+
+        if sort is None:
+            matches.sort()
+        else:
+            column = self.columns[sort]
+            matches.sort(key=lambda row: (math.isnan(column[row]), column[row]))
+
+        page = matches[offset:offset + limit]
+        results = [{field: self.records[row].get(field) for field in fields} for row in page]
+        return len(matches), results
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _in_any(value, intervals):
+    for low, high in intervals:
+        if (low is None or value >= low) and (high is None or value <= high):
+            return True
+    return False
+
+
+def raan_intervals(low=None, high=None, center=None, tolerance=None):
+    """Intervalos de RAAN en [0, 360), partidos si cruzan 0°/360°"""
+    if center is not None:
+        if tolerance is None:
+            raise ValueError("raan requiere raan_tolerance")
+        if tolerance >= 180:
+            return [(None, None)]
+        low, high = (center - tolerance) % 360, (center + tolerance) % 360
+    if low is not None and high is not None and low > high:
+        return [(low, None), (None, high)]
+    return [(low, high)]
+
+
+class CatalogIndexCache:
+    """Índice del snapshot vigente, construido una vez por generación"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get(self, snapshot):
+        index = self._index
+        if index is not None and index.generation >= snapshot.generation:
+            return index
+        with self._lock:
+            if self._index is None or self._index.generation < snapshot.generation:
+                self._index = CatalogIndex(snapshot)
+                print(f"🔎 Índice de catálogo construido: {len(self._index.records)} objetos "
+                      f"(generación {snapshot.generation})")
+            return self._index
+
+
+catalog_index = CatalogIndexCache()
@@ -0,0 +1,219 @@
+"""
+Feed de CDM críticos nuevos o modificados (Server-Sent Events)
+Tras cada publicación de snapshot compara los CDM por CDM_ID con la última
+descarga de CDM completa y envía solo los cambios a los clientes suscritos,
+cada uno con su filtro y un buffer acotado.
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+
+from serialization import dumps
+
+# Campos cuyo cambio convierte un CDM en 'updated'
+CDM_TRACKED_FIELDS = ('TCA', 'PC', 'PC_UNCERTAINTY', 'MISS_DISTANCE', 'RELATIVE_VELOCITY')
+
+SUBSCRIBER_BUFFER_SIZE = 256
+HISTORY_SIZE = 1000
+HEARTBEAT_SECONDS = 15
+
+
+def _pc(record):
+    try:
+        return float(record.get('PC') or 0)
+    except ValueError:
+        return 0.0
+
+
+def diff_cdm(previous_records, new_records):
+    """Eventos 'new' y 'updated' entre dos listas de CDM, por CDM_ID"""
+    previous_by_id = {record.get('CDM_ID'): record for record in previous_records}
+    events = []
+    for record in new_records:
+        cdm_id = record.get('CDM_ID')
+        old = previous_by_id.get(cdm_id)
+        if old is None:
+            events.append({
+                "type": "new",
+                "cdm_id": cdm_id,
+                "pc": _pc(record),
+                "pc_delta": None,
+                "cdm": record
+            })
+        elif any(old.get(field) != record.get(field) for field in CDM_TRACKED_FIELDS):
+            events.append({
+                "type": "updated",
+                "cdm_id": cdm_id,
+                "pc": _pc(record),
+                "pc_delta": _pc(record) - _pc(old),
+                "cdm": record
+            })
+    return events
+
+
+def cdm_fetch_complete(snapshot):
+    """La descarga de CDM del snapshot terminó sin errores
+
+    Extracciones anteriores a fetch_status no registran el estado y se
+    consideran completas.
+    """
+    status = snapshot.metadata.get('fetch_status', {}).get('critical_cdm')
+    if status is None:
+        return True
+    return bool(status.get('complete'))
+
+
+def event_id(snapshot_key, cdm_id):
+    """Id SSE de un evento, igual en todos los workers y tras reinicios"""
+    return f"{snapshot_key}:{cdm_id}"
+
+
+def snapshot_key(snapshot):
+    """Clave ordenable del snapshot: nombre del directorio datos_criticos_<fecha>"""
+    return os.path.basename(os.path.normpath(snapshot.directory))
+
+
+class Subscription:
+    """Cliente del feed con su filtro y buffer acotado"""
+
+    def __init__(self, loop, min_pc=0.0, object_ids=None, buffer_size=SUBSCRIBER_BUFFER_SIZE):
+        self.loop = loop
+        self.min_pc = min_pc
+        self.object_ids = set(object_ids) if object_ids else None
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.ready = asyncio.Event()
+
+    def matches(self, event):
+        if event["pc"] < self.min_pc:
+            return False
+        if self.object_ids is None:
+            return True
+        cdm = event["cdm"]
+        return cdm.get('OBJECT1_ID') in self.object_ids or cdm.get('OBJECT2_ID') in self.object_ids
+
+    def push(self, event):
+        """Encolar desde cualquier hilo"""
+        if self.matches(event):
+            self.loop.call_soon_threadsafe(self._append, event)
+
+    def _append(self, event):
+        # Backpressure: con el buffer lleno se descarta el evento más antiguo
+        # y se avisa al cliente para que se resincronice con /cdm
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self.ready.set()
+
+    def drain(self):
+        """Eventos pendientes y número de eventos descartados desde el último drenaje"""
+        events = list(self.buffer)
+        self.buffer.clear()
+        dropped, self.dropped = self.dropped, 0
+        self.ready.clear()
+        return events, dropped
+
+
+class CDMFeed:
+    """Distribuye los cambios de CDM de cada snapshot a los suscriptores"""
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        # Última lista de CDM descargada completa: referencia de los diffs
+        self._baseline = None
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, subscription, last_event_id=None):
+        """Registrar un cliente, reenviando eventos posteriores a last_event_id"""
+        with self._lock:
+            self._subscribers.add(subscription)
+            if last_event_id:
+                for event in self._events_after(last_event_id):
+                    subscription.push(event)
+
+    def _events_after(self, last_event_id):
+        """Eventos del historial posteriores a last_event_id
+
+        El id es '<snapshot>:<CDM_ID>'; los snapshots se comparan por nombre
+        de directorio (fecha de extracción). Si el CDM no aparece en el
+        snapshot (otro worker, historial rotado) se reenvía el snapshot
+        entero: mejor un duplicado que un evento perdido.
+        """
+        key, _, cdm_id = last_event_id.partition(':')
+        same = [event for event in self._history if event["snapshot"] == key]
+        ids = [event["cdm_id"] for event in same]
+        if cdm_id in ids:
+            same = same[ids.index(cdm_id) + 1:]
+        return same + [event for event in self._history if event["snapshot"] > key]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def on_publish(self, previous, snapshot):
+        """Listener del SnapshotStore"""
+        if not cdm_fetch_complete(snapshot):
+            # Una descarga fallida publica [] u otra lista parcial; compararla
+            # haría que la próxima extracción buena reenviara todo como 'new'
+            print(f"⚠️ Feed CDM: generación {snapshot.generation} con CDM incompletos, sin diff")
+            return
+
+        baseline, self._baseline = self._baseline, snapshot.records['critical_cdm']
+        if baseline is None:
+            # Primer snapshot completo del proceso: no hay referencia con qué comparar
+            return
+
+        events = diff_cdm(baseline, snapshot.records['critical_cdm'])
+        key = snapshot_key(snapshot)
+        with self._lock:
+            for event in events:
+                event["id"] = event_id(key, event["cdm_id"])
+                event["snapshot"] = key
+                self._history.append(event)
+                for subscription in self._subscribers:
+                    subscription.push(event)
+
+        if events:
+            print(f"📣 Feed CDM: {len(events)} cambios enviados a {len(self._subscribers)} clientes")
+
+
+def format_sse(event_type, data, event_id=None):
+    """Mensaje SSE"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {dumps(data).decode('utf-8')}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_stream(feed, subscription, request, last_event_id=None):
+    """Generador SSE de un cliente hasta que se desconecte"""
+    feed.subscribe(subscription, last_event_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+
+            events, dropped = subscription.drain()
+            if dropped:
+                yield format_sse("lagged", {"dropped": dropped})
+            for event in events:
+                yield format_sse(event["type"], event, event["id"])
+    finally:
+        feed.unsubscribe(subscription)
+
+
+cdm_feed = CDMFeed()
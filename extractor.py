@@ -13,6 +13,11 @@ from datetime import datetime, timedelta
 import time
 from collections import defaultdict
 import glob
+import shutil
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from snapshots import risk_stats
 
 # Azure Blob Storage
 try:
@@ -69,6 +74,122 @@ def install_dependencies():
     
     return True
 
+# Descarga por rangos de NORAD_CAT_ID
+FETCH_CHUNK_SIZE = int(os.getenv('SPACE_TRACK_CHUNK_SIZE', '10000'))
+FETCH_MAX_NORAD_ID = int(os.getenv('SPACE_TRACK_MAX_NORAD_ID', '100000'))
+FETCH_WORKERS = int(os.getenv('SPACE_TRACK_WORKERS', '3'))
+# Space-Track admite como máximo 30 consultas por minuto
+FETCH_REQUESTS_PER_MINUTE = float(os.getenv('SPACE_TRACK_REQUESTS_PER_MINUTE', '20'))
+FETCH_RETRIES = int(os.getenv('SPACE_TRACK_RETRIES', '4'))
+FETCH_BACKOFF_SECONDS = float(os.getenv('SPACE_TRACK_BACKOFF_SECONDS', '5'))
+# (conexión, lectura): las respuestas más grandes tardan más de 30s
+FETCH_TIMEOUT = (10, float(os.getenv('SPACE_TRACK_READ_TIMEOUT', '180')))
+CHECKPOINT_DIR = os.getenv('SPACE_TRACK_CHECKPOINT_DIR', '.checkpoints')
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv('SPACE_TRACK_CHECKPOINT_HOURS', '6'))
+
+def norad_id_chunks(chunk_size=None, max_id=None):
+    """Rangos de NORAD_CAT_ID en sintaxis Space-Track ('1--10000', ..., '>100000')"""
+    chunk_size = chunk_size or FETCH_CHUNK_SIZE
+    max_id = max_id or FETCH_MAX_NORAD_ID
+    chunks = []
+    for low in range(1, max_id + 1, chunk_size):
+        high = min(low + chunk_size - 1, max_id)
+        chunks.append(f"{low}--{high}")
+    # Rango abierto para no perder objetos con IDs nuevos
+    chunks.append(f"%3E{max_id}")
+    return chunks
+
+def filter_tle(item, record_type):
+    """Filtrar solo campos esenciales de un TLE"""
+    return {
+        'NORAD_CAT_ID': item.get('NORAD_CAT_ID', ''),
+        'OBJECT_NAME': item.get('OBJECT_NAME', ''),
+        'EPOCH': item.get('EPOCH', ''),
+        'MEAN_MOTION': item.get('MEAN_MOTION', ''),
+        'ECCENTRICITY': item.get('ECCENTRICITY', ''),
+        'INCLINATION': item.get('INCLINATION', ''),
+        'RA_OF_ASC_NODE': item.get('RA_OF_ASC_NODE', ''),
+        'ARG_OF_PERICENTER': item.get('ARG_OF_PERICENTER', ''),
+        'MEAN_ANOMALY': item.get('MEAN_ANOMALY', ''),
+        'BSTAR': item.get('BSTAR', ''),
+        '_source': 'space_track',
+        '_type': record_type
+    }
+
+class RetryAfter(Exception):
+    """Respuesta 429 de Space-Track"""
+    
+    def __init__(self, retry_after):
+        try:
+            self.seconds = float(retry_after)
+        except (TypeError, ValueError):
+            self.seconds = 60.0
+        super().__init__(f"HTTP 429 (Retry-After {self.seconds:.0f}s)")
+
+class RateLimiter:
+    """Espaciar consultas entre hilos para respetar el límite por minuto"""
+    
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0
+        self._lock = threading.Lock()
+        self._next = 0.0
+    
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+class ChunkCheckpoint:
+    """Rangos ya descargados de una consulta, guardados en disco"""
+    
+    def __init__(self, kind, query):
+        self.directory = os.path.join(CHECKPOINT_DIR, kind)
+        self.query = query
+        self.manifest_file = os.path.join(self.directory, "manifest.json")
+        self._prepare()
+    
+    def _prepare(self):
+        """Descartar checkpoints de otra consulta o demasiado viejos"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            age_hours = (time.time() - manifest['created']) / 3600
+            if manifest.get('query') == self.query and age_hours <= CHECKPOINT_MAX_AGE_HOURS:
+                return
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        
+        self.clear()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.manifest_file, 'w', encoding='utf-8') as f:
+            json.dump({'query': self.query, 'created': time.time()}, f)
+    
+    def _path(self, chunk):
+        name = chunk.replace('%3E', 'gt').replace('--', '-')
+        return os.path.join(self.directory, f"{name}.json")
+    
+    def load(self, chunk):
+        """Registros del rango si ya se descargó, o None"""
+        try:
+            with open(self._path(chunk), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def save(self, chunk, records):
+        """Guardar un rango de forma atómica"""
+        path = self._path(chunk)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
 class SpaceTrackExtractor:
     """Extractor de Space-Track.org para datos críticos"""
     
@@ -78,6 +199,8 @@ class SpaceTrackExtractor:
         self.authenticated = False
         self.username = username
         self.password = password
+        self.rate_limiter = RateLimiter(FETCH_REQUESTS_PER_MINUTE)
+        self.fetch_status = {}
     
     def authenticate(self):
         """Autenticar con Space-Track"""
@@ -107,117 +230,162 @@ class SpaceTrackExtractor:
             print(f"❌ Error Space-Track: {e}")
             return False
     
+    def _get_with_retry(self, url, label):
+        """GET con reintentos y backoff exponencial, respetando el límite de tasa"""
+        last_error = None
+        for attempt in range(FETCH_RETRIES + 1):
+            if attempt:
+                delay = FETCH_BACKOFF_SECONDS * (2 ** (attempt - 1)) + random.uniform(0, 1)
+                if isinstance(last_error, RetryAfter):
+                    delay = max(delay, last_error.seconds)
+                print(f"🔁 Reintentando {label} en {delay:.1f}s (intento {attempt + 1}/{FETCH_RETRIES + 1})")
+                time.sleep(delay)
+            
+            self.rate_limiter.wait()
+            try:
+                response = self.session.get(url, timeout=FETCH_TIMEOUT)
+            except requests.RequestException as e:
+                last_error = e
+                continue
+            
+            if response.status_code == 200:
+                try:
+                    return response.json()
+                except ValueError as e:
+                    # Respuesta truncada o no JSON: reintentar
+                    last_error = e
+                    continue
+            
+            if response.status_code == 429:
+                last_error = RetryAfter(response.headers.get('Retry-After'))
+            elif response.status_code >= 500:
+                last_error = Exception(f"HTTP {response.status_code}")
+            else:
+                # 4xx distintos de 429 no se resuelven reintentando
+                raise Exception(f"HTTP {response.status_code}")
+        
+        raise Exception(f"{label}: {last_error}")
+    
+    def _fetch_catalog(self, kind, query, record_type):
+        """Descargar una consulta de catálogo por rangos de NORAD_CAT_ID
+
+        Los rangos se descargan en paralelo dentro del límite de tasa, cada uno
+        con reintentos, y se guardan en disco para reanudar extracciones
+        interrumpidas. El estado parcial queda en self.fetch_status[kind].
+        """
+        checkpoint = ChunkCheckpoint(kind, query)
+        chunks = norad_id_chunks()
+        status = {
+            'chunks_total': len(chunks),
+            'chunks_ok': 0,
+            'chunks_resumed': 0,
+            'chunks_failed': [],
+            'errors': {},
+            'complete': False
+        }
+        results = {}
+        
+        pending = []
+        for chunk in chunks:
+            cached = checkpoint.load(chunk)
+            if cached is not None:
+                results[chunk] = cached
+                status['chunks_resumed'] += 1
+            else:
+                pending.append(chunk)
+        
+        if status['chunks_resumed']:
+            print(f"♻️ {kind}: reanudando, {status['chunks_resumed']}/{len(chunks)} rangos desde checkpoint")
+        
+        def fetch(chunk):
+            url = f"{self.base_url}/basicspacedata/query/class/tle_latest/NORAD_CAT_ID/{chunk}/{query}/format/json/orderby/NORAD_CAT_ID"
+            data = self._get_with_retry(url, f"{kind} [{chunk}]")
+            return [filter_tle(item, record_type) for item in data]
+        
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            futures = {executor.submit(fetch, chunk): chunk for chunk in pending}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    records = future.result()
+                    checkpoint.save(chunk, records)
+                    results[chunk] = records
+                except Exception as e:
+                    print(f"❌ {kind}: rango {chunk} falló: {e}")
+                    status['chunks_failed'].append(chunk)
+                    status['errors'][chunk] = str(e)
+        
+        status['chunks_ok'] = len(results)
+        status['complete'] = not status['chunks_failed']
+        if status['complete']:
+            checkpoint.clear()
+        self.fetch_status[kind] = status
+        
+        # Mantener el orden por NORAD_CAT_ID
+        filtered_data = []
+        for chunk in chunks:
+            filtered_data.extend(results.get(chunk, []))
+        return filtered_data
+    
     def extract_active_tle(self):
         """Extraer TLE de satélites activos (últimos 7 días)"""
         print("📡 Extrayendo TLE de satélites activos...")
         
-        try:
-            # TLE de satélites activos, últimos 7 días
-            url = f"{self.base_url}/basicspacedata/query/class/tle_latest/ORDINAL/1/EPOCH/%3Enow-7/format/json/orderby/NORAD_CAT_ID"
-            response = self.session.get(url, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                # Filtrar solo campos esenciales
-                filtered_data = []
-                for item in data:
-                    filtered_item = {
-                        'NORAD_CAT_ID': item.get('NORAD_CAT_ID', ''),
-                        'OBJECT_NAME': item.get('OBJECT_NAME', ''),
-                        'EPOCH': item.get('EPOCH', ''),
-                        'MEAN_MOTION': item.get('MEAN_MOTION', ''),
-                        'ECCENTRICITY': item.get('ECCENTRICITY', ''),
-                        'INCLINATION': item.get('INCLINATION', ''),
-                        'RA_OF_ASC_NODE': item.get('RA_OF_ASC_NODE', ''),
-                        'ARG_OF_PERICENTER': item.get('ARG_OF_PERICENTER', ''),
-                        'MEAN_ANOMALY': item.get('MEAN_ANOMALY', ''),
-                        'BSTAR': item.get('BSTAR', ''),
-                        '_source': 'space_track',
-                        '_type': 'active_tle'
-                    }
-                    filtered_data.append(filtered_item)
-                
-                print(f"✅ TLE activos: {len(filtered_data)} satélites")
-                return filtered_data
-            return []
-        except Exception as e:
-            print(f"❌ Error TLE activos: {e}")
-            return []
+        # TLE de satélites activos, últimos 7 días
+        filtered_data = self._fetch_catalog('active_tle', "ORDINAL/1/EPOCH/%3Enow-7", 'active_tle')
+        print(f"✅ TLE activos: {len(filtered_data)} satélites")
+        return filtered_data
     
     def extract_debris_tle(self):
         """Extraer TLE de basura espacial crítica (últimos 30 días)"""
         print("🗑️ Extrayendo TLE de basura espacial crítica...")
         
-        try:
-            # TLE de basura espacial, últimos 30 días
-            url = f"{self.base_url}/basicspacedata/query/class/tle_latest/ORDINAL/1/EPOCH/%3Enow-30/OBJECT_TYPE/DEBRIS/format/json/orderby/NORAD_CAT_ID"
-            response = self.session.get(url, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                # Filtrar solo campos esenciales
-                filtered_data = []
-                for item in data:
-                    filtered_item = {
-                        'NORAD_CAT_ID': item.get('NORAD_CAT_ID', ''),
-                        'OBJECT_NAME': item.get('OBJECT_NAME', ''),
-                        'EPOCH': item.get('EPOCH', ''),
-                        'MEAN_MOTION': item.get('MEAN_MOTION', ''),
-                        'ECCENTRICITY': item.get('ECCENTRICITY', ''),
-                        'INCLINATION': item.get('INCLINATION', ''),
-                        'RA_OF_ASC_NODE': item.get('RA_OF_ASC_NODE', ''),
-                        'ARG_OF_PERICENTER': item.get('ARG_OF_PERICENTER', ''),
-                        'MEAN_ANOMALY': item.get('MEAN_ANOMALY', ''),
-                        'BSTAR': item.get('BSTAR', ''),
-                        '_source': 'space_track',
-                        '_type': 'debris_tle'
-                    }
-                    filtered_data.append(filtered_item)
-                
-                print(f"✅ TLE basura espacial: {len(filtered_data)} objetos")
-                return filtered_data
-            return []
-        except Exception as e:
-            print(f"❌ Error TLE basura espacial: {e}")
-            return []
+        # TLE de basura espacial, últimos 30 días
+        filtered_data = self._fetch_catalog('debris_tle', "ORDINAL/1/EPOCH/%3Enow-30/OBJECT_TYPE/DEBRIS", 'debris_tle')
+        print(f"✅ TLE basura espacial: {len(filtered_data)} objetos")
+        return filtered_data
     
     def extract_critical_cdm(self):
         """Extraer CDM críticos (últimos 7 días, alta probabilidad)"""
         print("⚠️ Extrayendo CDM críticos...")
         
+        status = {'chunks_total': 1, 'chunks_ok': 0, 'chunks_resumed': 0,
+                  'chunks_failed': [], 'errors': {}, 'complete': False}
+        self.fetch_status['critical_cdm'] = status
         try:
             # CDM de los últimos 7 días con alta probabilidad de colisión
             url = f"{self.base_url}/basicspacedata/query/class/cdm_public/TCA/%3Enow-7/PC/%3E0.001/format/json/orderby/TCA%20DESC"
-            response = self.session.get(url, timeout=30)
+            data = self._get_with_retry(url, "critical_cdm")
             
-            if response.status_code == 200:
-                data = response.json()
-                # Filtrar solo campos esenciales para prevención
-                filtered_data = []
-                for item in data:
-                    filtered_item = {
-                        'CDM_ID': item.get('CDM_ID', ''),
-                        'TCA': item.get('TCA', ''),
-                        'PC': item.get('PC', ''),
-                        'PC_UNCERTAINTY': item.get('PC_UNCERTAINTY', ''),
-                        'MISS_DISTANCE': item.get('MISS_DISTANCE', ''),
-                        'MISS_DISTANCE_UNCERTAINTY': item.get('MISS_DISTANCE_UNCERTAINTY', ''),
-                        'OBJECT1_ID': item.get('OBJECT1_ID', ''),
-                        'OBJECT1_NAME': item.get('OBJECT1_NAME', ''),
-                        'OBJECT2_ID': item.get('OBJECT2_ID', ''),
-                        'OBJECT2_NAME': item.get('OBJECT2_NAME', ''),
-                        'RELATIVE_VELOCITY': item.get('RELATIVE_VELOCITY', ''),
-                        'RELATIVE_VELOCITY_UNCERTAINTY': item.get('RELATIVE_VELOCITY_UNCERTAINTY', ''),
-                        '_source': 'space_track',
-                        '_type': 'critical_cdm'
-                    }
-                    filtered_data.append(filtered_item)
-                
-                print(f"✅ CDM críticos: {len(filtered_data)} eventos")
-                return filtered_data
-            return []
+            # Filtrar solo campos esenciales para prevención
+            filtered_data = []
+            for item in data:
+                filtered_item = {
+                    'CDM_ID': item.get('CDM_ID', ''),
+                    'TCA': item.get('TCA', ''),
+                    'PC': item.get('PC', ''),
+                    'PC_UNCERTAINTY': item.get('PC_UNCERTAINTY', ''),
+                    'MISS_DISTANCE': item.get('MISS_DISTANCE', ''),
+                    'MISS_DISTANCE_UNCERTAINTY': item.get('MISS_DISTANCE_UNCERTAINTY', ''),
+                    'OBJECT1_ID': item.get('OBJECT1_ID', ''),
+                    'OBJECT1_NAME': item.get('OBJECT1_NAME', ''),
+                    'OBJECT2_ID': item.get('OBJECT2_ID', ''),
+                    'OBJECT2_NAME': item.get('OBJECT2_NAME', ''),
+                    'RELATIVE_VELOCITY': item.get('RELATIVE_VELOCITY', ''),
+                    'RELATIVE_VELOCITY_UNCERTAINTY': item.get('RELATIVE_VELOCITY_UNCERTAINTY', ''),
+                    '_source': 'space_track',
+                    '_type': 'critical_cdm'
+                }
+                filtered_data.append(filtered_item)
+            
+            status['chunks_ok'] = 1
+            status['complete'] = True
+            print(f"✅ CDM críticos: {len(filtered_data)} eventos")
+            return filtered_data
         except Exception as e:
             print(f"❌ Error CDM críticos: {e}")
+            status['chunks_failed'].append('all')
+            status['errors']['all'] = str(e)
             return []
     
     def logout(self):
@@ -273,10 +441,15 @@ class EssentialExtractor:
                     'total_active_tle': len(active_tle),
                     'total_debris_tle': len(debris_tle),
                     'total_critical_cdm': len(critical_cdm),
-                    'total_records': len(active_tle) + len(debris_tle) + len(critical_cdm)
+                    'total_records': len(active_tle) + len(debris_tle) + len(critical_cdm),
+                    'complete': all(status['complete'] for status in self.space_track.fetch_status.values()),
+                    'fetch_status': self.space_track.fetch_status
                 }
             }
             
+            if not all_data['metadata']['complete']:
+                print("⚠️ Extracción parcial: revisar 'fetch_status' en metadata")
+            
             return all_data
             
         finally:
@@ -286,8 +459,10 @@ class EssentialExtractor:
         """Guardar datos en archivos CSV separados"""
         print("💾 Guardando datos críticos...")
         
-        # Crear directorio de resultados
-        output_dir = f"datos_criticos_{self.timestamp}"
+        # Escribir en un directorio temporal y renombrarlo al final, para que
+        # los lectores nunca vean una extracción a medio escribir
+        final_dir = f"datos_criticos_{self.timestamp}"
+        output_dir = f".{final_dir}.tmp"
         os.makedirs(output_dir, exist_ok=True)
         
         # Guardar TLE activos
@@ -323,24 +498,24 @@ class EssentialExtractor:
             json.dump(data['metadata'], f, indent=2, ensure_ascii=False)
         print(f"✅ Metadata guardada: {metadata_file}")
         
-        return output_dir
+        if os.path.exists(final_dir):
+            shutil.rmtree(final_dir)
+        os.rename(output_dir, final_dir)
+        print(f"✅ Extracción publicada en: {final_dir}")
+        
+        return final_dir
     
     def show_stats(self, data, return_text=False):
         """Mostrar estadísticas detalladas"""
         metadata = data['metadata']
         
+        if return_text:
+            return risk_stats(data['critical_cdm'], metadata['total_records'])
+        
         # Análisis de CDM críticos
         high_risk = [cdm for cdm in data['critical_cdm'] if float(cdm.get('PC', 0)) > 0.01]
         medium_risk = [cdm for cdm in data['critical_cdm'] if 0.001 < float(cdm.get('PC', 0)) <= 0.01]
         
-        if return_text:
-            return {
-                "high_risk": len(high_risk),
-                "medium_risk": len(medium_risk),
-                "low_risk": len(data['critical_cdm']) - len(high_risk) - len(medium_risk),
-                "total": metadata['total_records']
-            }
-        
         print("\n" + "="*60)
         print("📊 ESTADÍSTICAS DE EXTRACCIÓN CRÍTICA")
         print("="*60)
@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga HTTP de la API con umbrales de latencia (SLO)
+
+Genera peticiones a tasa de llegada fija (lazo abierto) contra la app en
+proceso (ASGI), contra un uvicorn local levantado por el script, o contra una
+URL existente. Los datos se sirven desde un snapshot sintético que reemplaza a
+Space-Track. Reporta p50/p95/p99, throughput y tasa de error por endpoint y
+falla (exit 1) si no se cumplen los umbrales de load_test_slo.json.
+
+Uso:
+    python load_test.py --target inprocess --rate 200 --duration 30
+    python load_test.py --target local --rate 500 --duration 60
+    python load_test.py --target http://localhost:8003 --mix /health=1,/cdm=3
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SLO_FILE = os.path.join(REPO_DIR, "load_test_slo.json")
+
+# Peso relativo de cada endpoint en la mezcla por defecto
+DEFAULT_MIX = {
+    "/health": 1,
+    "/files": 2,
+    "/download/{filename}": 1,
+    "/cdm": 2,
+    "/stats": 2,
+    "/tle/{norad_id}": 4,
+    "/objects/search?{search}": 2
+}
+
+# Archivos pequeños para /download (los CSV de TLE miden varios MB)
+DOWNLOAD_FILES = ["metadata.json", "cdm_criticos.csv"]
+
+# Consultas representativas de /objects/search (sin comas: --mix las separa)
+SEARCH_QUERIES = [
+    "perigee_min=500&perigee_max=600&inclination_min=97&inclination_max=99",
+    "object_type=debris_tle&altitude_min=700&altitude_max=900",
+    "raan=357&raan_tolerance=5&sort=PERIGEE",
+    "inclination_min=51&inclination_max=52&offset=100&limit=500",
+    "eccentricity_min=0.03&sort=APOGEE&limit=1000"
+]
+
+# Tamaño de página al recorrer /objects/search (su límite máximo)
+SEARCH_PAGE_SIZE = 1000
+
+
+# ---------------------------------------------------------------------------
+# Sustituto de Space-Track: snapshot sintético
+# ---------------------------------------------------------------------------
+
+def build_stub_snapshot(base_dir, active=8000, debris=4000, cdm=500, seed=42):
+    """Escribir un directorio datos_criticos_* con datos sintéticos"""
+    rng = random.Random(seed)
+    output_dir = os.path.join(base_dir, f"datos_criticos_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(output_dir, exist_ok=True)
+    epoch = datetime.now().isoformat()
+
+    def tle(norad_id, record_type):
+        return {
+            'NORAD_CAT_ID': str(norad_id),
+            'OBJECT_NAME': f"OBJECT {norad_id}",
+            'EPOCH': epoch,
+            'MEAN_MOTION': f"{rng.uniform(11.0, 16.2):.8f}",
+            'ECCENTRICITY': f"{rng.uniform(0.0, 0.05):.7f}",
+            'INCLINATION': f"{rng.uniform(0.0, 110.0):.4f}",
+            'RA_OF_ASC_NODE': f"{rng.uniform(0.0, 360.0):.4f}",
+            'ARG_OF_PERICENTER': f"{rng.uniform(0.0, 360.0):.4f}",
+            'MEAN_ANOMALY': f"{rng.uniform(0.0, 360.0):.4f}",
+            'BSTAR': f"{rng.uniform(0.0, 0.001):.8f}",
+            '_source': 'stub',
+            '_type': record_type
+        }
+
+    active_tle = [tle(norad_id, 'active_tle') for norad_id in range(1, active + 1)]
+    debris_tle = [tle(norad_id, 'debris_tle') for norad_id in range(active + 1, active + debris + 1)]
+    all_ids = [record['NORAD_CAT_ID'] for record in active_tle + debris_tle]
+    critical_cdm = []
+    for cdm_id in range(1, cdm + 1):
+        object1, object2 = rng.sample(all_ids, 2)
+        critical_cdm.append({
+            'CDM_ID': str(cdm_id),
+            'TCA': epoch,
+            'PC': f"{10 ** rng.uniform(-3, -1):.6f}",
+            'PC_UNCERTAINTY': '',
+            'MISS_DISTANCE': f"{rng.uniform(10, 5000):.1f}",
+            'MISS_DISTANCE_UNCERTAINTY': '',
+            'OBJECT1_ID': object1,
+            'OBJECT1_NAME': f"OBJECT {object1}",
+            'OBJECT2_ID': object2,
+            'OBJECT2_NAME': f"OBJECT {object2}",
+            'RELATIVE_VELOCITY': f"{rng.uniform(100, 15000):.1f}",
+            'RELATIVE_VELOCITY_UNCERTAINTY': '',
+            '_source': 'stub',
+            '_type': 'critical_cdm'
+        })
+
+    for filename, records in (("tle_activos.csv", active_tle),
+                              ("tle_basura_espacial.csv", debris_tle),
+                              ("cdm_criticos.csv", critical_cdm)):
+        with open(os.path.join(output_dir, filename), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=records[0].keys())
+            writer.writeheader()
+            writer.writerows(records)
+
+    metadata = {
+        'extraction_time': datetime.now().isoformat(),
+        'total_active_tle': len(active_tle),
+        'total_debris_tle': len(debris_tle),
+        'total_critical_cdm': len(critical_cdm),
+        'total_records': len(active_tle) + len(debris_tle) + len(critical_cdm),
+        'complete': True,
+        'fetch_status': {}
+    }
+    with open(os.path.join(output_dir, "metadata.json"), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    return output_dir, all_ids
+
+
+# ---------------------------------------------------------------------------
+# Clientes: ASGI en proceso y HTTP/1.1 con keep-alive
+# ---------------------------------------------------------------------------
+
+class InProcessClient:
+    """Llama a la app ASGI directamente, sin red"""
+
+    def __init__(self, app, headers):
+        self.app = app
+        self.headers = [(key.lower().encode(), value.encode()) for key, value in headers.items()]
+
+    async def get(self, path):
+        path_only, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path_only,
+            "raw_path": path_only.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"loadtest")] + self.headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("loadtest", 80)
+        }
+        done = asyncio.Event()
+        request_sent = False
+        status = 0
+        size = 0
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        return status, size
+
+    async def close(self):
+        pass
+
+
+class HTTPClient:
+    """Cliente HTTP/1.1 mínimo con pool de conexiones keep-alive"""
+
+    def __init__(self, base_url, headers, max_connections=256):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.headers = "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def get(self, path):
+        async with self._slots:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n{self.headers}\r\n".encode())
+                await writer.drain()
+                status, size, keep_alive = await self._read_response(reader)
+            except BaseException:
+                # Incluye CancelledError del timeout de wait_for: no reutilizar
+                # una conexión con una respuesta a medio leer
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, size
+
+    @staticmethod
+    async def _read_response(reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Conexión cerrada por el servidor")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        size = 0
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                chunk_size = int((await reader.readline()).split(b";")[0], 16)
+                if chunk_size == 0:
+                    await reader.readline()
+                    break
+                size += len(await reader.readexactly(chunk_size))
+                await reader.readline()
+        elif "content-length" in headers:
+            size = len(await reader.readexactly(int(headers["content-length"])))
+
+        keep_alive = headers.get("connection", "").lower() != "close"
+        return status, size, keep_alive
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+# ---------------------------------------------------------------------------
+# Generador de carga y métricas
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ordenada"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, duration):
+    """Métricas de una lista de (latencia_ms, ok)"""
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": errors / count if count else 0.0,
+        "throughput_rps": count / duration if duration else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else None
+    }
+
+
+def parse_mix(text):
+    """'/health=1,/cdm=3' -> {'/health': 1.0, '/cdm': 3.0}"""
+    mix = {}
+    for item in text.split(","):
+        endpoint, _, weight = item.partition("=")
+        mix[endpoint.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadGenerator:
+    """Emite peticiones a tasa fija y mide la latencia desde el instante previsto"""
+
+    def __init__(self, client, mix, rate, duration, norad_ids, arrival="poisson",
+                 timeout=10.0, seed=1):
+        self.client = client
+        self.endpoints = list(mix.keys())
+        self.weights = list(mix.values())
+        self.rate = rate
+        self.duration = duration
+        self.norad_ids = norad_ids
+        self.arrival = arrival
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.samples = {endpoint: [] for endpoint in self.endpoints}
+
+    def _path(self, endpoint):
+        return (endpoint
+                .replace("{filename}", self.rng.choice(DOWNLOAD_FILES))
+                .replace("{norad_id}", self.rng.choice(self.norad_ids))
+                .replace("{search}", self.rng.choice(SEARCH_QUERIES)))
+
+    async def _request(self, endpoint, scheduled):
+        ok = False
+        try:
+            status, _ = await asyncio.wait_for(self.client.get(self._path(endpoint)), self.timeout)
+            ok = 200 <= status < 400
+        except Exception:
+            ok = False
+        # Medir desde el instante previsto evita la omisión coordinada:
+        # si el generador o el servidor se atrasan, la espera cuenta como latencia
+        latency_ms = (time.perf_counter() - scheduled) * 1000
+        self.samples[endpoint].append((latency_ms, ok))
+
+    async def run(self):
+        loop_start = time.perf_counter()
+        next_time = loop_start
+        tasks = []
+        while True:
+            if self.arrival == "poisson":
+                next_time += self.rng.expovariate(self.rate)
+            else:
+                next_time += 1.0 / self.rate
+            if next_time - loop_start >= self.duration:
+                break
+
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+            tasks.append(asyncio.ensure_future(self._request(endpoint, next_time)))
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - loop_start
+
+        all_samples = [sample for samples in self.samples.values() for sample in samples]
+        total_weight = sum(self.weights)
+        report = {
+            "target_rate_rps": self.rate,
+            "mix_share": {endpoint: weight / total_weight
+                          for endpoint, weight in zip(self.endpoints, self.weights)},
+            "duration_s": round(elapsed, 2),
+            "overall": summarize(all_samples, elapsed),
+            "endpoints": {endpoint: summarize(samples, elapsed)
+                          for endpoint, samples in self.samples.items()}
+        }
+        return report
+
+
+def check_slo(report, slo):
+    """Lista de incumplimientos de los umbrales"""
+    violations = []
+
+    def check(scope, metrics, limits, share=1.0):
+        if not metrics["requests"]:
+            return
+        for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms", "error_rate"):
+            if key in limits and metrics[key] is not None and metrics[key] > limits[key]:
+                violations.append(f"{scope}: {key} {metrics[key]:.4g} > {limits[key]}")
+        if "min_throughput_ratio" in limits:
+            # Cada endpoint recibe solo su parte de la mezcla de la tasa objetivo
+            ratio = metrics["throughput_rps"] / (report["target_rate_rps"] * share)
+            if ratio < limits["min_throughput_ratio"]:
+                violations.append(f"{scope}: throughput {ratio:.2%} de su tasa objetivo "
+                                  f"< {limits['min_throughput_ratio']:.0%}")
+
+    check("overall", report["overall"], slo.get("overall", {}))
+    for endpoint, limits in slo.get("endpoints", {}).items():
+        if endpoint in report["endpoints"]:
+            check(endpoint, report["endpoints"][endpoint], limits, report["mix_share"][endpoint])
+    return violations
+
+
+def print_report(report):
+    print("\n" + "=" * 84)
+    print(f"📊 PRUEBA DE CARGA: {report['target_rate_rps']:.0f} req/s objetivo, {report['duration_s']}s")
+    print("=" * 84)
+    print(f"{'endpoint':<24}{'reqs':>8}{'rps':>9}{'err%':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["overall"])]
+    for endpoint, metrics in rows:
+        def fmt(value):
+            return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+        print(f"{endpoint:<24}{metrics['requests']:>8}{metrics['throughput_rps']:>9.1f}"
+              f"{metrics['error_rate'] * 100:>8.2f}{fmt(metrics['p50_ms'])}{fmt(metrics['p95_ms'])}"
+              f"{fmt(metrics['p99_ms'])}{fmt(metrics['max_ms'])}")
+    print("=" * 84)
+
+
+# ---------------------------------------------------------------------------
+# Destinos
+# ---------------------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _load_app(data_dir, snapshot_dir):
+    """Importar main.app sin planificador y publicar el snapshot sintético"""
+    os.environ["EXTRACTION_SCHEDULER_ENABLED"] = "false"
+    os.chdir(data_dir)
+    sys.path.insert(0, REPO_DIR)
+    import main
+    main.store.publish(os.path.basename(snapshot_dir))
+    return main.app
+
+
+def _served_norad_ids(url):
+    """NORAD_CAT_ID del catálogo que sirve un servidor existente"""
+    ids = []
+    offset, total = 0, None
+    while total is None or offset < total:
+        query = f"fields=NORAD_CAT_ID&offset={offset}&limit={SEARCH_PAGE_SIZE}"
+        with urlopen(f"{url.rstrip('/')}/objects/search?{query}", timeout=30) as response:
+            payload = json.load(response)
+        total = payload["total"]
+        if not payload["results"]:
+            break
+        ids.extend(result["NORAD_CAT_ID"] for result in payload["results"] if result.get("NORAD_CAT_ID"))
+        offset += len(payload["results"])
+    if not ids:
+        raise RuntimeError(f"{url} no tiene objetos en el catálogo con los que pedir /tle")
+    return ids
+
+
+async def _wait_for_server(url, timeout=30):
+    client = HTTPClient(url, {})
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status, _ = await client.get("/health")
+            if status == 200:
+                await client.close()
+                return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"El servidor en {url} no respondió en {timeout}s")
+
+
+async def run_load_test(args):
+    headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+    mix = parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX)
+    server = None
+
+    if args.target in ("inprocess", "local"):
+        data_dir = tempfile.mkdtemp(prefix="loadtest_")
+        snapshot_dir, norad_ids = build_stub_snapshot(
+            data_dir, active=args.active, debris=args.debris, cdm=args.cdm
+        )
+        print(f"🧪 Snapshot sintético: {snapshot_dir}")
+
+    if args.target == "inprocess":
+        client = InProcessClient(_load_app(data_dir, snapshot_dir), headers)
+    elif args.target == "local":
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, EXTRACTION_SCHEDULER_ENABLED="false", PYTHONPATH=REPO_DIR)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", str(port), "--log-level", "warning", "--workers", str(args.workers)],
+            cwd=data_dir, env=env
+        )
+        await _wait_for_server(url)
+        client = HTTPClient(url, headers, args.connections)
+    else:
+        # Servidor existente: usar los NORAD_CAT_ID que él mismo sirve
+        norad_ids = _served_norad_ids(args.target)
+        client = HTTPClient(args.target, headers, args.connections)
+
+    try:
+        # Calentamiento: poblar cachés y conexiones antes de medir
+        warmup = LoadGenerator(client, mix, args.rate, args.warmup, norad_ids, args.arrival, seed=0)
+        if args.warmup > 0:
+            await warmup.run()
+
+        generator = LoadGenerator(client, mix, args.rate, args.duration, norad_ids,
+                                  args.arrival, timeout=args.timeout)
+        return await generator.run()
+    finally:
+        await client.close()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de Satellite Collision Avoidance API")
+    parser.add_argument("--target", default="inprocess",
+                        help="'inprocess', 'local' (levanta uvicorn) o URL de un servidor")
+    parser.add_argument("--rate", type=float, default=200, help="Peticiones por segundo")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de medición")
+    parser.add_argument("--warmup", type=float, default=3, help="Segundos de calentamiento")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--mix", help="Mezcla de endpoints, ej. '/health=1,/cdm=3,/tle/{norad_id}=4'")
+    parser.add_argument("--timeout", type=float, default=10, help="Timeout por petición (s)")
+    parser.add_argument("--connections", type=int, default=256, help="Conexiones HTTP máximas")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn (--target local)")
+    parser.add_argument("--no-gzip", dest="gzip", action="store_false", help="No enviar Accept-Encoding: gzip")
+    parser.add_argument("--active", type=int, default=8000, help="TLE activos sintéticos")
+    parser.add_argument("--debris", type=int, default=4000, help="TLE de basura sintéticos")
+    parser.add_argument("--cdm", type=int, default=500, help="CDM sintéticos")
+    parser.add_argument("--slo", default=DEFAULT_SLO_FILE, help="Archivo JSON de umbrales")
+    parser.add_argument("--json-out", help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args))
+    print_report(report)
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if not args.slo or not os.path.exists(args.slo):
+        print("⚠️ Sin archivo de SLO: no se evalúan umbrales")
+        return
+
+    with open(args.slo, 'r', encoding='utf-8') as f:
+        slo = json.load(f)
+    violations = check_slo(report, slo)
+    if violations:
+        print("❌ SLO incumplidos:")
+        for violation in violations:
+            print(f"   - {violation}")
+        sys.exit(1)
+    print("✅ Todos los SLO cumplidos")
+
+
+if __name__ == "__main__":
+    main()
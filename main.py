@@ -1,12 +1,17 @@
-from fastapi import FastAPI, HTTPException
-from extractor import EssentialExtractor
+from fastapi import FastAPI, HTTPException, Request
+from scheduler import ExtractionScheduler, load_scheduler_config
+from snapshots import store
+from serialization import response_cache, cached_json_response, json_response
+from catalog_index import catalog_index, raan_intervals, MAX_LIMIT
+from orbits import parse_epoch
+from cdm_feed import cdm_feed, Subscription, sse_stream
+import asyncio
 import uvicorn
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import traceback
 import logging
 import os
-import glob
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +23,74 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Planificador de extracciones periódicas
+scheduler_config = load_scheduler_config()
+scheduler = ExtractionScheduler(
+    store,
+    interval=scheduler_config['interval'],
+    jitter=scheduler_config['jitter'],
+    catchup=scheduler_config['catchup'],
+    poll_interval=scheduler_config['poll_interval'],
+    keep=scheduler_config['keep']
+)
+
+def files_payload(snapshot):
+    return {
+        "directory": snapshot.directory,
+        "generation": snapshot.generation,
+        "extraction_time": snapshot.metadata.get("extraction_time"),
+        "files": snapshot.files
+    }
+
+def cdm_payload(snapshot):
+    return {
+        "generation": snapshot.generation,
+        "extraction_time": snapshot.metadata.get("extraction_time"),
+        "count": len(snapshot.records['critical_cdm']),
+        "cdm": snapshot.records['critical_cdm']
+    }
+
+def stats_payload(snapshot):
+    return {
+        "generation": snapshot.generation,
+        "metadata": snapshot.metadata,
+        "stats": snapshot.stats
+    }
+
+# Payloads serializados al publicar cada snapshot
+HOT_PAYLOADS = {
+    "files": files_payload,
+    "cdm": cdm_payload,
+    "stats": stats_payload
+}
+
+store.add_listener(lambda previous, snapshot: response_cache.warm(snapshot, HOT_PAYLOADS))
+store.add_listener(cdm_feed.on_publish)
+store.add_listener(lambda previous, snapshot: catalog_index.get(snapshot))
+
+CDM_STREAM_MAX_CLIENTS = int(os.getenv('CDM_STREAM_MAX_CLIENTS', '500'))
+
+@app.on_event("startup")
+def startup():
+    # Servir de inmediato la última extracción en disco
+    store.load_latest()
+    # Aun sin extracción periódica, el hilo publica lo que extraen otros workers
+    scheduler.start(periodic=scheduler_config['enabled'])
+
+@app.on_event("shutdown")
+def shutdown():
+    scheduler.stop()
+
+@app.middleware("http")
+async def snapshot_headers(request: Request, call_next):
+    """Informar la frescura del snapshot en todas las lecturas"""
+    response = await call_next(request)
+    snapshot = store.current()
+    if request.method == "GET" and snapshot is not None:
+        for key, value in snapshot.headers().items():
+            response.headers.setdefault(key, value)
+    return response
+
 @app.get("/")
 def root():
     return {"message": "API para prevención de colisiones satelitales"}
@@ -26,18 +99,22 @@ def root():
 def extract_data():
     try:
         logger.info("Iniciando extracción de datos...")
-        extractor = EssentialExtractor()
-        logger.info("Extractor inicializado correctamente")
-        
-        result = extractor.run()
+        result = scheduler.run_once()
+        if result is None:
+            raise HTTPException(status_code=409, detail="Ya hay una extracción en curso")
         logger.info("Extracción completada exitosamente")
         
+        snapshot = store.current()
         return {
             "status": "success",
+            # Una extracción incompleta no reemplaza al snapshot completo vigente
+            "published": snapshot is not None and snapshot.directory == result["csv_output"],
             "metadata": result["metadata"],
             "stats": result["stats"],
             "csv_output_dir": result["csv_output"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error en extracción: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -47,6 +124,11 @@ def extract_data():
 def health_check():
     return {"status": "healthy", "service": "satellite-extractor-api"}
 
+@app.get("/scheduler")
+def scheduler_status():
+    """Estado del planificador de extracciones"""
+    return scheduler.status()
+
 @app.get("/env-debug")
 def env_debug():
     return {
@@ -55,47 +137,140 @@ def env_debug():
     }
 
 @app.get("/files")
-def list_files():
+def list_files(request: Request):
     """Listar archivos CSV disponibles"""
     try:
-        # Buscar directorios de datos críticos
-        data_dirs = glob.glob("datos_criticos_*")
-        if not data_dirs:
+        snapshot = store.current()
+        if snapshot is None:
             return {"message": "No hay archivos de datos disponibles", "files": []}
         
-        # Obtener el directorio más reciente
-        latest_dir = max(data_dirs, key=os.path.getctime)
-        
-        # Listar archivos en el directorio
-        files = []
-        for file_path in glob.glob(f"{latest_dir}/*"):
-            if os.path.isfile(file_path):
-                files.append({
-                    "name": os.path.basename(file_path),
-                    "size": os.path.getsize(file_path),
-                    "path": file_path
-                })
-        
-        return {
-            "directory": latest_dir,
-            "files": files
-        }
+        return cached_json_response(request, response_cache.get(snapshot, "files", files_payload))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listando archivos: {str(e)}")
 
+@app.get("/cdm")
+def list_cdm(request: Request):
+    """CDM críticos del snapshot vigente"""
+    snapshot = store.current()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No hay datos disponibles")
+    return cached_json_response(request, response_cache.get(snapshot, "cdm", cdm_payload))
+
+@app.get("/stats")
+def get_stats(request: Request):
+    """Metadata y estadísticas de riesgo del snapshot vigente"""
+    snapshot = store.current()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No hay datos disponibles")
+    return cached_json_response(request, response_cache.get(snapshot, "stats", stats_payload))
+
+@app.get("/tle/{norad_id}")
+def get_tle(norad_id: str, request: Request):
+    """TLE de un objeto por NORAD_CAT_ID"""
+    snapshot = store.current()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No hay datos disponibles")
+    
+    record = snapshot.tle_by_id.get(norad_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Objeto {norad_id} no encontrado")
+    
+    cached = response_cache.get(snapshot, f"tle:{norad_id}", lambda s: record)
+    return cached_json_response(request, cached)
+
+@app.get("/objects/search")
+def search_objects(
+    inclination_min: Optional[float] = None, inclination_max: Optional[float] = None,
+    raan_min: Optional[float] = None, raan_max: Optional[float] = None,
+    raan: Optional[float] = None, raan_tolerance: Optional[float] = None,
+    perigee_min: Optional[float] = None, perigee_max: Optional[float] = None,
+    apogee_min: Optional[float] = None, apogee_max: Optional[float] = None,
+    altitude_min: Optional[float] = None, altitude_max: Optional[float] = None,
+    period_min: Optional[float] = None, period_max: Optional[float] = None,
+    eccentricity_min: Optional[float] = None, eccentricity_max: Optional[float] = None,
+    epoch_min: Optional[str] = None, epoch_max: Optional[str] = None,
+    object_type: Optional[str] = None, fields: Optional[str] = None, sort: Optional[str] = None,
+    offset: int = 0, limit: int = 100
+):
+    """Buscar objetos del catálogo por rangos de elementos orbitales
+
+    Altitudes en km, ángulos en grados, periodo en minutos. altitude_min/max
+    selecciona objetos cuya órbita [perigeo, apogeo] cruza ese rango;
+    raan + raan_tolerance admite rangos que cruzan 0°/360°.
+    """
+    snapshot = store.current()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No hay datos disponibles")
+    if offset < 0 or not 0 < limit <= MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"offset >= 0 y 0 < limit <= {MAX_LIMIT}")
+    
+    try:
+        ranges = []
+        for column, low, high in (
+            ('INCLINATION', inclination_min, inclination_max),
+            ('PERIGEE', perigee_min, perigee_max),
+            ('APOGEE', apogee_min, apogee_max),
+            ('PERIOD', period_min, period_max),
+            ('ECCENTRICITY', eccentricity_min, eccentricity_max),
+            ('EPOCH_TS', parse_epoch(epoch_min) if epoch_min else None,
+             parse_epoch(epoch_max) if epoch_max else None),
+            # La órbita cruza [altitude_min, altitude_max]
+            ('PERIGEE', None, altitude_max),
+            ('APOGEE', altitude_min, None)
+        ):
+            if low is not None or high is not None:
+                ranges.append((column, [(low, high)]))
+        if raan is not None or raan_min is not None or raan_max is not None:
+            ranges.append(('RA_OF_ASC_NODE', raan_intervals(raan_min, raan_max, raan, raan_tolerance)))
+        
+        index = catalog_index.get(snapshot)
+        total, results = index.search(
+            ranges,
+            object_type=object_type,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+            sort=sort,
+            offset=offset,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return json_response({
+        "generation": index.generation,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "results": results
+    })
+
+@app.get("/stream/cdm")
+async def stream_cdm(request: Request, min_pc: float = 0.0, object_ids: Optional[str] = None):
+    """Feed SSE de CDM críticos nuevos o modificados tras cada extracción"""
+    if cdm_feed.subscriber_count() >= CDM_STREAM_MAX_CLIENTS:
+        raise HTTPException(status_code=503, detail="Demasiados clientes conectados al feed")
+    
+    ids = [object_id.strip() for object_id in object_ids.split(",") if object_id.strip()] if object_ids else None
+    # Reconexión de EventSource: reenviar lo emitido desde el último id recibido
+    last_event_id = request.headers.get("last-event-id") or None
+    subscription = Subscription(asyncio.get_running_loop(), min_pc=min_pc, object_ids=ids)
+
+    return StreamingResponse(
+        sse_stream(cdm_feed, subscription, request, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/download/{filename}")
 def download_file(filename: str):
     """Descargar archivo específico"""
     try:
-        # Buscar el archivo en el directorio más reciente
-        data_dirs = glob.glob("datos_criticos_*")
-        if not data_dirs:
+        # Buscar el archivo en el snapshot vigente
+        snapshot = store.current()
+        if snapshot is None:
             raise HTTPException(status_code=404, detail="No hay archivos disponibles")
         
-        latest_dir = max(data_dirs, key=os.path.getctime)
-        file_path = os.path.join(latest_dir, filename)
-        
-        if not os.path.exists(file_path):
+        file_path = snapshot.file_path(filename)
+        if file_path is None or not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail=f"Archivo {filename} no encontrado")
         
         return FileResponse(file_path, filename=filename)
@@ -0,0 +1,117 @@
+"""
+Elementos orbitales derivados y propagación analítica
+Propagación kepleriana con perturbaciones seculares J2 a partir de los
+elementos medios de los TLE. Es suficiente para filtrar conjunciones y para
+índices de búsqueda; no sustituye a SGP4 para predicciones precisas.
+"""
+
+import math
+from datetime import datetime, timezone
+
+MU_EARTH = 398600.4418      # km^3/s^2
+EARTH_RADIUS = 6378.137     # km
+J2 = 1.08262668e-3
+SECONDS_PER_DAY = 86400.0
+TWO_PI = 2 * math.pi
+
+
+def parse_epoch(text):
+    """EPOCH de Space-Track ('2024-01-15T10:30:00.123456' o con espacio) a epoch UTC"""
+    text = text.strip().replace(' ', 'T')
+    if text.endswith('Z'):
+        text = text[:-1]
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp()
+
+
+def derived_elements(record):
+    """Semieje mayor, perigeo, apogeo (altitud km) y periodo (min) de un TLE"""
+    mean_motion = float(record['MEAN_MOTION'])  # revoluciones por día
+    eccentricity = float(record['ECCENTRICITY'])
+    n = mean_motion * TWO_PI / SECONDS_PER_DAY
+    semi_major_axis = (MU_EARTH / (n * n)) ** (1.0 / 3.0)
+    return {
+        'SEMI_MAJOR_AXIS': semi_major_axis,
+        'PERIGEE': semi_major_axis * (1 - eccentricity) - EARTH_RADIUS,
+        'APOGEE': semi_major_axis * (1 + eccentricity) - EARTH_RADIUS,
+        'PERIOD': 1440.0 / mean_motion
+    }
+
+
+class Orbit:
+    """Órbita propagable de un objeto del catálogo"""
+
+    __slots__ = ('norad_id', 'epoch', 'a', 'e', 'cos_i', 'sin_i', 'raan0', 'raan_dot',
+                 'argp0', 'argp_dot', 'm0', 'm_dot', 'sqrt_1_e2', 'p_factor',
+                 'perigee', 'apogee')
+
+    def __init__(self, record):
+        self.norad_id = str(record['NORAD_CAT_ID'])
+        self.epoch = parse_epoch(record['EPOCH'])
+        mean_motion = float(record['MEAN_MOTION'])
+        self.e = float(record['ECCENTRICITY'])
+        inclination = math.radians(float(record['INCLINATION']))
+        self.raan0 = math.radians(float(record['RA_OF_ASC_NODE']))
+        self.argp0 = math.radians(float(record['ARG_OF_PERICENTER']))
+        self.m0 = math.radians(float(record['MEAN_ANOMALY']))
+
+        n = mean_motion * TWO_PI / SECONDS_PER_DAY
+        self.a = (MU_EARTH / (n * n)) ** (1.0 / 3.0)
+        self.cos_i = math.cos(inclination)
+        self.sin_i = math.sin(inclination)
+        self.sqrt_1_e2 = math.sqrt(1 - self.e * self.e)
+        p = self.a * (1 - self.e * self.e)
+        self.p_factor = math.sqrt(MU_EARTH / p)
+
+        # Derivas seculares por J2
+        k = 1.5 * n * J2 * (EARTH_RADIUS / p) ** 2
+        self.raan_dot = -k * self.cos_i
+        self.argp_dot = 0.5 * k * (5 * self.cos_i ** 2 - 1)
+        self.m_dot = n + 0.5 * k * self.sqrt_1_e2 * (3 * self.cos_i ** 2 - 1)
+
+        self.perigee = self.a * (1 - self.e) - EARTH_RADIUS
+        self.apogee = self.a * (1 + self.e) - EARTH_RADIUS
+
+    def state(self, t):
+        """Posición (km) y velocidad (km/s) inerciales en el instante t (epoch UTC)"""
+        dt = t - self.epoch
+        e = self.e
+        mean_anomaly = (self.m0 + self.m_dot * dt) % TWO_PI
+
+        # Ecuación de Kepler por Newton-Raphson
+        E = mean_anomaly if e < 0.8 else math.pi
+        for _ in range(15):
+            f = E - e * math.sin(E) - mean_anomaly
+            delta = f / (1 - e * math.cos(E))
+            E -= delta
+            if abs(delta) < 1e-12:
+                break
+
+        cos_E = math.cos(E)
+        sin_E = math.sin(E)
+        r = self.a * (1 - e * cos_E)
+        cos_nu = (cos_E - e) / (1 - e * cos_E)
+        sin_nu = self.sqrt_1_e2 * sin_E / (1 - e * cos_E)
+
+        # Perifocal
+        xp = r * cos_nu
+        yp = r * sin_nu
+        vxp = -self.p_factor * sin_nu
+        vyp = self.p_factor * (e + cos_nu)
+
+        raan = self.raan0 + self.raan_dot * dt
+        argp = self.argp0 + self.argp_dot * dt
+        cos_o, sin_o = math.cos(raan), math.sin(raan)
+        cos_w, sin_w = math.cos(argp), math.sin(argp)
+        cos_i, sin_i = self.cos_i, self.sin_i
+
+        r11 = cos_o * cos_w - sin_o * sin_w * cos_i
+        r12 = -cos_o * sin_w - sin_o * cos_w * cos_i
+        r21 = sin_o * cos_w + cos_o * sin_w * cos_i
+        r22 = -sin_o * sin_w + cos_o * cos_w * cos_i
+        r31 = sin_w * sin_i
+        r32 = cos_w * sin_i
+
+        return (
+            (r11 * xp + r12 * yp, r21 * xp + r22 * yp, r31 * xp + r32 * yp),
+            (r11 * vxp + r12 * vyp, r21 * vxp + r22 * vyp, r31 * vxp + r32 * vyp)
+        )
@@ -0,0 +1,325 @@
+"""
+Planificador de extracciones periódicas
+Ejecuta EssentialExtractor.run en segundo plano con intervalo configurable,
+jitter, un único ejecutor simultáneo y política de recuperación de ejecuciones
+perdidas. Cada extracción exitosa se publica en el SnapshotStore.
+"""
+
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from extractor import EssentialExtractor
+from snapshots import is_complete, latest_snapshot_dir, prune_snapshots, read_metadata, snapshot_created_at
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Políticas de recuperación cuando se pierde una o más ejecuciones
+# (arranque con datos viejos, extracción más larga que el intervalo)
+CATCHUP_RUN_ONCE = "run_once"  # Ejecutar de inmediato una sola vez
+CATCHUP_SKIP = "skip"          # Esperar al siguiente turno regular
+CATCHUP_POLICIES = (CATCHUP_RUN_ONCE, CATCHUP_SKIP)
+
+LOCK_FILE = ".extraction.lock"
+
+
+def load_scheduler_config():
+    """Cargar configuración del planificador desde variables de entorno"""
+    catchup = os.getenv('EXTRACTION_CATCHUP', CATCHUP_RUN_ONCE).strip().lower()
+    if catchup not in CATCHUP_POLICIES:
+        print(f"⚠️ EXTRACTION_CATCHUP '{catchup}' no válida - usando '{CATCHUP_RUN_ONCE}'")
+        catchup = CATCHUP_RUN_ONCE
+
+    return {
+        'enabled': os.getenv('EXTRACTION_SCHEDULER_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes'),
+        'interval': float(os.getenv('EXTRACTION_INTERVAL_MINUTES', '60')) * 60,
+        'jitter': float(os.getenv('EXTRACTION_JITTER_SECONDS', '120')),
+        'catchup': catchup,
+        'poll_interval': float(os.getenv('SNAPSHOT_POLL_SECONDS', '30')),
+        'keep': int(os.getenv('SNAPSHOT_KEEP', '3'))
+    }
+
+
+class ExtractionLock:
+    """Candado de ejecutor único: entre hilos y entre procesos (workers de uvicorn)"""
+
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self):
+        """Intentar tomar el candado sin bloquear"""
+        if not self._thread_lock.acquire(blocking=False):
+            return False
+
+        if FCNTL_AVAILABLE:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    self._thread_lock.release()
+                    return False
+                self._fd = fd
+            except OSError as e:
+                print(f"⚠️ No se pudo usar el archivo de bloqueo {self.path}: {e}")
+
+        return True
+
+    def release(self):
+        """Liberar el candado"""
+        if self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+
+    def locked(self):
+        return self._thread_lock.locked()
+
+
+class ExtractionScheduler:
+    """Ejecuta extracciones periódicas y publica los snapshots resultantes"""
+
+    def __init__(self, store, interval=3600, jitter=0, catchup=CATCHUP_RUN_ONCE,
+                 poll_interval=30, keep=3, extractor_factory=EssentialExtractor):
+        if catchup not in CATCHUP_POLICIES:
+            raise ValueError(f"Política de recuperación no válida: {catchup}")
+
+        self.store = store
+        self.interval = interval
+        self.jitter = jitter
+        self.catchup = catchup
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self.extractor_factory = extractor_factory
+
+        self._lock = ExtractionLock()
+        self._publish_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_run = None
+        self._last_started = None
+        self._last_finished = None
+        self._last_error = None
+        self._last_result = None
+        self._withheld = None
+        self._runs = 0
+        self._failures = 0
+        self._missed = 0
+
+    def start(self, periodic=True):
+        """Arrancar el hilo del planificador
+
+        Con periodic=False no se programan extracciones, pero el hilo sigue
+        publicando las extracciones que otros workers dejan en disco.
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._next_run = self._initial_run_time() if periodic else None
+        self._thread = threading.Thread(target=self._loop, name="extraction-scheduler", daemon=True)
+        self._thread.start()
+        if periodic:
+            print(f"⏱️ Planificador iniciado: cada {self.interval:.0f}s (jitter {self.jitter:.0f}s, "
+                  f"recuperación '{self.catchup}')")
+        else:
+            print(f"⏱️ Extracción periódica deshabilitada: revisando disco cada {self.poll_interval:.0f}s")
+
+    def stop(self, timeout=5):
+        """Detener el hilo del planificador"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        """Ejecutar una extracción si no hay otra en curso
+
+        Devuelve el resultado de EssentialExtractor.run, o None si otra
+        extracción ya tiene el candado. Las excepciones se propagan.
+        """
+        if not self._lock.acquire():
+            return None
+        try:
+            return self._extract()
+        finally:
+            self._lock.release()
+
+    def _run_scheduled(self, started):
+        """Turno programado: extraer salvo que otro worker lo haya hecho ya
+
+        El candado solo evita extracciones simultáneas; cada worker tiene su
+        propio turno, así que sin esta comprobación N workers extraerían N
+        veces por intervalo.
+        """
+        if not self._lock.acquire():
+            print("⚠️ Extracción planificada omitida: otra extracción en curso")
+            self._schedule_next(started)
+            return
+
+        try:
+            directory = latest_snapshot_dir()
+            if directory is not None:
+                created_at = snapshot_created_at(directory)
+                if created_at + self.interval > time.time():
+                    print(f"⏭️ Extracción planificada omitida: {directory} es reciente")
+                    self._publish_if_new(directory)
+                    self._schedule_next(created_at)
+                    return
+            self._extract()
+        except Exception as e:
+            print(f"❌ Error en extracción planificada: {e}")
+            print(traceback.format_exc())
+        finally:
+            self._lock.release()
+        self._schedule_next(started)
+
+    def _extract(self):
+        """Extraer y publicar; el llamador tiene el candado"""
+        self._last_started = time.time()
+        try:
+            print("🚀 Extracción planificada iniciada")
+            extractor = self.extractor_factory()
+            result = extractor.run()
+            self._publish_if_new(result["csv_output"])
+            self._prune()
+            self._last_result = result
+            self._last_error = None
+            self._runs += 1
+            return result
+        except Exception as e:
+            self._failures += 1
+            self._last_error = str(e)
+            raise
+        finally:
+            self._last_finished = time.time()
+
+    def _prune(self):
+        """Aplicar la retención de extracciones en disco sin tocar la servida"""
+        current = self.store.current()
+        try:
+            prune_snapshots(self.keep, protected={current.directory} if current else ())
+        except OSError as e:
+            print(f"⚠️ No se pudieron borrar extracciones antiguas: {e}")
+
+    def _publish_if_new(self, directory):
+        """Publicar un directorio salvo que ya sea el snapshot vigente
+
+        El hilo de revisión de disco puede detectar el directorio de una
+        extracción de este mismo proceso antes de que ella lo publique.
+        Una extracción incompleta (Space-Track caído, rangos fallidos) no
+        reemplaza a un snapshot completo: queda en disco y se informa en
+        status().
+        """
+        with self._publish_lock:
+            current = self.store.current()
+            if current is not None and current.directory == directory:
+                return None
+            if directory == self._withheld:
+                return None
+            if current is not None and current.complete and not is_complete(read_metadata(directory)):
+                self._withheld = directory
+                print(f"⚠️ Extracción incompleta {directory} no publicada: se sigue sirviendo {current.directory}")
+                return None
+            self._withheld = None
+            return self.store.publish(directory)
+
+    def status(self):
+        """Estado del planificador y del snapshot vigente"""
+        snapshot = self.store.current()
+        return {
+            "running": self._lock.locked(),
+            "interval_seconds": self.interval,
+            "jitter_seconds": self.jitter,
+            "catchup_policy": self.catchup,
+            "next_run": _isoformat(self._next_run),
+            "last_run_started": _isoformat(self._last_started),
+            "last_run_finished": _isoformat(self._last_finished),
+            "last_error": self._last_error,
+            "runs": self._runs,
+            "failures": self._failures,
+            "missed_runs": self._missed,
+            "withheld_incomplete_snapshot": self._withheld,
+            "snapshot_generation": snapshot.generation if snapshot else None,
+            "snapshot_complete": snapshot.complete if snapshot else None,
+            "snapshot_age_seconds": round(snapshot.age_seconds(), 1) if snapshot else None
+        }
+
+    def _jitter(self):
+        return random.uniform(0, self.jitter) if self.jitter > 0 else 0
+
+    def _initial_run_time(self):
+        """Primer turno según la antigüedad del snapshot vigente"""
+        now = time.time()
+        snapshot = self.store.current()
+        if snapshot is None:
+            # Sin datos que servir: extraer cuanto antes
+            return now
+
+        due = snapshot.created_at + self.interval
+        if due > now:
+            return due + self._jitter()
+
+        self._missed += 1
+        return self._catchup_time(due, now)
+
+    def _catchup_time(self, due, now):
+        """Siguiente turno cuando el turno 'due' ya pasó"""
+        if self.catchup == CATCHUP_RUN_ONCE:
+            return now + self._jitter()
+
+        # CATCHUP_SKIP: saltar los turnos perdidos y mantener la cadencia
+        missed = int((now - due) // self.interval) + 1
+        return due + missed * self.interval + self._jitter()
+
+    def _schedule_next(self, started):
+        now = time.time()
+        due = started + self.interval
+        if due > now:
+            self._next_run = due + self._jitter()
+        else:
+            self._missed += int((now - due) // self.interval) + 1
+            self._next_run = self._catchup_time(due, now)
+
+    def _refresh_from_disk(self):
+        """Publicar extracciones hechas por otros procesos"""
+        directory = latest_snapshot_dir()
+        if directory is None:
+            return
+        try:
+            snapshot = self._publish_if_new(directory)
+        except Exception as e:
+            print(f"❌ Error cargando snapshot {directory}: {e}")
+            return
+        if snapshot is not None and self._next_run is not None:
+            # Otro worker extrajo: el siguiente turno cuenta desde esa extracción
+            self._schedule_next(snapshot.created_at)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.time()
+            if self._next_run is not None and now >= self._next_run:
+                self._run_scheduled(now)
+                continue
+
+            self._refresh_from_disk()
+            wait = self.poll_interval
+            if self._next_run is not None:
+                wait = min(self._next_run - time.time(), wait)
+            self._stop.wait(max(wait, 0.1))
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+Screening de conjunciones paralelo
+Divide el catálogo de TLE (tle_activos.csv + tle_basura_espacial.csv) en
+unidades de trabajo por banda de altitud (con margen de solapamiento) y/o por
+franja de tiempo, las procesa en un pool de procesos o en varias máquinas
+mediante una cola de archivos, y fusiona los resultados sin duplicados.
+
+Uso:
+    python screening.py run --hours 48 --workers 16 --partition altitude --bands 64
+    python screening.py plan --queue /mnt/cola --hours 48 --partition both
+    python screening.py worker --queue /mnt/cola          # en cada nodo
+    python screening.py merge --queue /mnt/cola --output conjunciones.csv
+    python screening.py benchmark --synthetic 3000 --hours 1 --max-workers 16
+"""
+
+import argparse
+import csv
+import glob
+import json
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from orbits import Orbit, EARTH_RADIUS
+from snapshots import latest_snapshot_dir
+
+DEFAULT_STEP = 20.0           # segundos entre muestras
+DEFAULT_THRESHOLD = 5.0       # km de distancia mínima para reportar
+MAX_RELATIVE_SPEED = 16.0     # km/s, cota de velocidad relativa en LEO
+LINEAR_MARGIN = 1.0           # km de tolerancia del filtro lineal
+CLAIM_HEARTBEAT = 30.0        # segundos entre renovaciones del mtime de una unidad reclamada
+
+PARTITION_ALTITUDE = "altitude"
+PARTITION_TIME = "time"
+PARTITION_BOTH = "both"
+PARTITIONS = (PARTITION_ALTITUDE, PARTITION_TIME, PARTITION_BOTH)
+
+CATALOG_FILES = ("tle_activos.csv", "tle_basura_espacial.csv")
+CONJUNCTION_FIELDS = ['OBJECT1_ID', 'OBJECT2_ID', 'TCA', 'MISS_DISTANCE_KM',
+                      'RELATIVE_VELOCITY_KM_S', 'ALTITUDE_KM']
+
+# Celdas vecinas "hacia adelante": cada par de celdas adyacentes se revisa una sola vez
+_FORWARD_NEIGHBORS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)
+                      if (dx, dy, dz) > (0, 0, 0)]
+
+
+# ---------------------------------------------------------------------------
+# Catálogo
+# ---------------------------------------------------------------------------
+
+def load_catalog(directory=None):
+    """TLE activos y de basura de un directorio de extracción (por defecto el más reciente)"""
+    directory = directory or latest_snapshot_dir()
+    if directory is None:
+        raise Exception("No hay directorios de extracción disponibles")
+
+    records = {}
+    for filename in CATALOG_FILES:
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for record in csv.DictReader(f):
+                records[record['NORAD_CAT_ID']] = record
+    if not records:
+        # Extracción fallida: el directorio existe pero sin CSV de TLE
+        raise Exception(f"{directory} no contiene TLE ({', '.join(CATALOG_FILES)})")
+    print(f"📡 Catálogo cargado: {len(records)} objetos de {directory}")
+    return list(records.values())
+
+
+def synthetic_catalog(count, seed=42):
+    """TLE sintéticos en LEO con EPOCH actual, para medir sin un catálogo real"""
+    rng = random.Random(seed)
+    epoch = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+    return [{
+        'NORAD_CAT_ID': str(norad_id),
+        'OBJECT_NAME': f"OBJECT {norad_id}",
+        'EPOCH': epoch,
+        'MEAN_MOTION': f"{rng.uniform(11.0, 16.2):.8f}",
+        'ECCENTRICITY': f"{rng.uniform(0.0, 0.05):.7f}",
+        'INCLINATION': f"{rng.uniform(0.0, 110.0):.4f}",
+        'RA_OF_ASC_NODE': f"{rng.uniform(0.0, 360.0):.4f}",
+        'ARG_OF_PERICENTER': f"{rng.uniform(0.0, 360.0):.4f}",
+        'MEAN_ANOMALY': f"{rng.uniform(0.0, 360.0):.4f}",
+        'BSTAR': f"{rng.uniform(0.0, 0.001):.8f}",
+        '_source': 'synthetic',
+        '_type': 'active_tle'
+    } for norad_id in range(1, count + 1)]
+
+
+def build_orbits(records):
+    """Orbit por registro, omitiendo TLE incompletos"""
+    orbits = []
+    for record in records:
+        try:
+            orbits.append(Orbit(record))
+        except (KeyError, ValueError, ZeroDivisionError):
+            continue
+    return orbits
+
+
+# ---------------------------------------------------------------------------
+# Screening de una unidad de trabajo
+# ---------------------------------------------------------------------------
+
+def _relative(state_i, state_j):
+    (pi, vi), (pj, vj) = state_i, state_j
+    r = (pj[0] - pi[0], pj[1] - pi[1], pj[2] - pi[2])
+    v = (vj[0] - vi[0], vj[1] - vi[1], vj[2] - vi[2])
+    return r, v
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def refine_tca(orbit_i, orbit_j, t, low, high, iterations=6):
+    """TCA por linealizaciones sucesivas del movimiento relativo en [low, high]"""
+    for _ in range(iterations):
+        r, v = _relative(orbit_i.state(t), orbit_j.state(t))
+        vv = _dot(v, v)
+        if vv == 0:
+            break
+        dt = -_dot(r, v) / vv
+        t = min(max(t + dt, low), high)
+        if abs(dt) < 1e-3:
+            break
+
+    state_i, state_j = orbit_i.state(t), orbit_j.state(t)
+    r, v = _relative(state_i, state_j)
+    radius = (math.sqrt(_dot(state_i[0], state_i[0])) + math.sqrt(_dot(state_j[0], state_j[0]))) / 2
+    return t, math.sqrt(_dot(r, r)), math.sqrt(_dot(v, v)), radius - EARTH_RADIUS
+
+
+def _owns(unit, tca, altitude):
+    """La conjunción pertenece a esta unidad (evita duplicados entre unidades)"""
+    owner_start, owner_end = unit.get('owner_start'), unit.get('owner_end')
+    if owner_start is not None and tca < owner_start:
+        return False
+    if owner_end is not None and tca >= owner_end:
+        return False
+    band_low, band_high = unit.get('band_low'), unit.get('band_high')
+    if band_low is not None and altitude < band_low:
+        return False
+    if band_high is not None and altitude >= band_high:
+        return False
+    return True
+
+
+def screen_unit(unit):
+    """Buscar conjunciones de una unidad de trabajo
+
+    En cada muestra se agrupan los objetos en una grilla espacial con celdas
+    del tamaño máximo que puede cerrarse en medio paso; los pares de celdas
+    vecinas pasan un filtro lineal y los supervivientes se refinan hasta el TCA.
+    """
+    started = time.perf_counter()
+    orbits = build_orbits(unit['records'])
+    step = unit['step']
+    threshold = unit['threshold']
+    cell = threshold + MAX_RELATIVE_SPEED * step / 2
+    half_step = step / 2
+    linear_limit = threshold + LINEAR_MARGIN
+
+    conjunctions = []
+    for k in range(unit['sample_count']):
+        t = unit['sample_start'] + k * step
+        states = [orbit.state(t) for orbit in orbits]
+
+        grid = defaultdict(list)
+        for index, (position, _) in enumerate(states):
+            grid[(int(position[0] // cell), int(position[1] // cell), int(position[2] // cell))].append(index)
+
+        for key, members in grid.items():
+            neighbors = [members]
+            for dx, dy, dz in _FORWARD_NEIGHBORS:
+                other = grid.get((key[0] + dx, key[1] + dy, key[2] + dz))
+                if other:
+                    neighbors.append(other)
+
+            for position_in_cell, i in enumerate(members):
+                orbit_i = orbits[i]
+                for group_index, group in enumerate(neighbors):
+                    candidates = group[position_in_cell + 1:] if group_index == 0 else group
+                    for j in candidates:
+                        orbit_j = orbits[j]
+                        # Capas de altitud disjuntas: nunca se acercan
+                        if (orbit_i.apogee + threshold < orbit_j.perigee or
+                                orbit_j.apogee + threshold < orbit_i.perigee):
+                            continue
+
+                        r, v = _relative(states[i], states[j])
+                        rr = _dot(r, r)
+                        if rr > cell * cell:
+                            continue
+                        vv = _dot(v, v)
+                        tau = min(max(-_dot(r, v) / vv, -half_step), half_step) if vv else 0.0
+                        closest = (r[0] + v[0] * tau, r[1] + v[1] * tau, r[2] + v[2] * tau)
+                        if _dot(closest, closest) > linear_limit * linear_limit:
+                            continue
+
+                        tca, distance, speed, altitude = refine_tca(
+                            orbit_i, orbit_j, t + tau, t - step, t + step
+                        )
+                        # TCA en el borde del intervalo: el mínimo real lo
+                        # encuentra otra muestra (o cae fuera de la ventana)
+                        if tca <= t - step or tca >= t + step:
+                            continue
+                        if distance <= threshold and _owns(unit, tca, altitude):
+                            id1, id2 = sorted((orbit_i.norad_id, orbit_j.norad_id))
+                            conjunctions.append({
+                                'OBJECT1_ID': id1,
+                                'OBJECT2_ID': id2,
+                                'TCA': tca,
+                                'MISS_DISTANCE_KM': distance,
+                                'RELATIVE_VELOCITY_KM_S': speed,
+                                'ALTITUDE_KM': altitude
+                            })
+
+    return {
+        'unit_id': unit['unit_id'],
+        'objects': len(orbits),
+        'samples': unit['sample_count'],
+        'elapsed': time.perf_counter() - started,
+        'conjunctions': merge_conjunctions([conjunctions], step)
+    }
+
+
+def merge_conjunctions(conjunction_lists, window=DEFAULT_STEP):
+    """Unir listas de conjunciones eliminando duplicados
+
+    Dos detecciones del mismo par con TCA separados menos de 'window'
+    segundos son el mismo encuentro; se conserva la de menor distancia.
+    """
+    by_pair = defaultdict(list)
+    for conjunctions in conjunction_lists:
+        for conjunction in conjunctions:
+            by_pair[(conjunction['OBJECT1_ID'], conjunction['OBJECT2_ID'])].append(conjunction)
+
+    merged = []
+    for events in by_pair.values():
+        events.sort(key=lambda c: c['TCA'])
+        current = events[0]
+        for event in events[1:]:
+            if event['TCA'] - current['TCA'] < window:
+                if event['MISS_DISTANCE_KM'] < current['MISS_DISTANCE_KM']:
+                    current = event
+            else:
+                merged.append(current)
+                current = event
+        merged.append(current)
+
+    merged.sort(key=lambda c: (c['TCA'], c['OBJECT1_ID'], c['OBJECT2_ID']))
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Partición en unidades de trabajo
+# ---------------------------------------------------------------------------
+
+def _altitude_bands(orbits, bands):
+    """Bordes de bandas con igual número de objetos según altitud media"""
+    altitudes = sorted((orbit.perigee + orbit.apogee) / 2 for orbit in orbits)
+    if not altitudes:
+        return [(None, None)]
+    edges = [None]
+    for b in range(1, bands):
+        edge = altitudes[int(len(altitudes) * b / bands)]
+        if edges[-1] is None or edge > edges[-1]:
+            edges.append(edge)
+    edges.append(None)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def plan_units(records, start, end, partition=PARTITION_ALTITUDE, bands=16, slabs=4,
+               step=DEFAULT_STEP, threshold=DEFAULT_THRESHOLD):
+    """Dividir catálogo y ventana [start, end] (epoch UTC) en unidades de trabajo"""
+    if partition not in PARTITIONS:
+        raise ValueError(f"Partición no válida: {partition}")
+
+    orbits = build_orbits(records)
+    records_by_id = {str(record['NORAD_CAT_ID']): record for record in records}
+    total_samples = int((end - start) // step) + 1
+
+    # Bandas de altitud: cada objeto entra en todas las bandas que cruza su
+    # rango [perigeo, apogeo] ampliado por el umbral; la banda que contiene la
+    # altitud del TCA es la dueña de la conjunción
+    if partition in (PARTITION_ALTITUDE, PARTITION_BOTH):
+        band_list = []
+        for low, high in _altitude_bands(orbits, bands):
+            members = [records_by_id[orbit.norad_id] for orbit in orbits
+                       if (high is None or orbit.perigee - threshold < high) and
+                       (low is None or orbit.apogee + threshold >= low)]
+            if members:
+                band_list.append((low, high, members))
+    else:
+        band_list = [(None, None, [records_by_id[orbit.norad_id] for orbit in orbits])]
+
+    # Franjas de tiempo: cada franja muestrea un paso extra a cada lado y se
+    # queda con los TCA entre los puntos medios de sus muestras extremas
+    if partition in (PARTITION_TIME, PARTITION_BOTH):
+        per_slab = math.ceil(total_samples / slabs)
+        slab_list = []
+        for first in range(0, total_samples, per_slab):
+            last = min(first + per_slab, total_samples) - 1
+            slab_list.append((
+                None if first == 0 else start + (first - 0.5) * step,
+                None if last == total_samples - 1 else start + (last + 0.5) * step,
+                max(first - 1, 0),
+                min(last + 1, total_samples - 1)
+            ))
+    else:
+        slab_list = [(None, None, 0, total_samples - 1)]
+
+    units = []
+    for band_low, band_high, members in band_list:
+        for owner_start, owner_end, first, last in slab_list:
+            units.append({
+                'unit_id': f"u{len(units):05d}",
+                'records': members,
+                'band_low': band_low,
+                'band_high': band_high,
+                'owner_start': owner_start,
+                'owner_end': owner_end,
+                'sample_start': start + first * step,
+                'sample_count': last - first + 1,
+                'step': step,
+                'threshold': threshold
+            })
+
+    replicated = sum(len(unit['records']) for unit in units) / max(len(units), 1)
+    print(f"🧩 {len(units)} unidades ({len(band_list)} bandas x {len(slab_list)} franjas), "
+          f"{replicated:.0f} objetos promedio por unidad")
+    return units
+
+
+# ---------------------------------------------------------------------------
+# Ejecución: pool de procesos y cola de archivos
+# ---------------------------------------------------------------------------
+
+def run_units(units, workers=None):
+    """Procesar unidades en un pool de procesos (workers=1: en este proceso)"""
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        return [screen_unit(unit) for unit in units]
+
+    # Unidades grandes primero para equilibrar la cola del pool
+    order = sorted(units, key=lambda u: len(u['records']) ** 2 * u['sample_count'], reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(screen_unit, order, chunksize=1))
+
+
+def enqueue_units(queue_dir, units):
+    """Escribir unidades en la cola compartida"""
+    for state in ("pending", "claimed", "done"):
+        os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+    for unit in units:
+        _write_json(os.path.join(queue_dir, "pending", f"{unit['unit_id']}.json"), unit)
+    _write_json(os.path.join(queue_dir, "plan.json"), {
+        'units': [unit['unit_id'] for unit in units],
+        'step': units[0]['step'] if units else DEFAULT_STEP,
+        'created': time.time()
+    })
+    print(f"✅ {len(units)} unidades encoladas en {queue_dir}")
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def _heartbeat(path, stop, interval=CLAIM_HEARTBEAT):
+    """Renovar el mtime de una unidad reclamada mientras se procesa"""
+    while not stop.wait(interval):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return  # Reencolada por otro worker
+
+
+def _requeue_stale(queue_dir, max_age):
+    """Devolver a pending las unidades reclamadas por workers caídos
+
+    El worker dueño renueva el mtime cada CLAIM_HEARTBEAT segundos, así que
+    max_age debe superarlo con holgura.
+    """
+    now = time.time()
+    for path in glob.glob(os.path.join(queue_dir, "claimed", "*.json")):
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.rename(path, os.path.join(queue_dir, "pending", os.path.basename(path)))
+                print(f"♻️ Unidad reencolada: {os.path.basename(path)}")
+        except FileNotFoundError:
+            pass
+
+
+def run_worker(queue_dir, requeue_after=None, wait=False, poll=5.0):
+    """Procesar unidades de la cola hasta vaciarla
+
+    Reclamar una unidad es renombrar su archivo de pending/ a claimed/; el
+    rename es atómico, así que varios nodos sobre el mismo sistema de archivos
+    nunca procesan la misma unidad.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    while True:
+        if requeue_after:
+            _requeue_stale(queue_dir, requeue_after)
+
+        pending = sorted(glob.glob(os.path.join(queue_dir, "pending", "*.json")))
+        if not pending:
+            if wait and not _queue_finished(queue_dir):
+                time.sleep(poll)
+                continue
+            break
+
+        for path in pending:
+            claimed = os.path.join(queue_dir, "claimed", os.path.basename(path))
+            try:
+                os.rename(path, claimed)
+                # rename conserva el mtime de cuando se encoló la unidad
+                os.utime(claimed)
+            except FileNotFoundError:
+                continue  # Otro worker la reclamó
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=_heartbeat, args=(claimed, stop), daemon=True)
+            heartbeat.start()
+            try:
+                with open(claimed, 'r', encoding='utf-8') as f:
+                    unit = json.load(f)
+                result = screen_unit(unit)
+            finally:
+                stop.set()
+                heartbeat.join()
+            result['worker'] = worker_id
+            _write_json(os.path.join(queue_dir, "done", os.path.basename(path)), result)
+            try:
+                os.remove(claimed)
+            except FileNotFoundError:
+                pass  # Reencolada y reclamada por otro worker: su resultado es idéntico
+            processed += 1
+            print(f"✅ {unit['unit_id']}: {len(result['conjunctions'])} conjunciones "
+                  f"en {result['elapsed']:.1f}s ({worker_id})")
+            break
+
+    print(f"🏁 Worker {worker_id}: {processed} unidades procesadas")
+    return processed
+
+
+def _queue_finished(queue_dir):
+    with open(os.path.join(queue_dir, "plan.json"), 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    done = {os.path.basename(p)[:-5] for p in glob.glob(os.path.join(queue_dir, "done", "*.json"))}
+    return set(plan['units']) <= done
+
+
+def collect_results(queue_dir):
+    """Resultados terminados de la cola y unidades que faltan"""
+    with open(os.path.join(queue_dir, "plan.json"), 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    results = []
+    for path in glob.glob(os.path.join(queue_dir, "done", "*.json")):
+        with open(path, 'r', encoding='utf-8') as f:
+            results.append(json.load(f))
+    missing = sorted(set(plan['units']) - {result['unit_id'] for result in results})
+    return results, missing, plan['step']
+
+
+def write_conjunctions(path, conjunctions):
+    """Guardar conjunciones en CSV"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CONJUNCTION_FIELDS)
+        writer.writeheader()
+        for conjunction in conjunctions:
+            row = dict(conjunction)
+            row['TCA'] = datetime.fromtimestamp(row['TCA'], tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')
+            for field in ('MISS_DISTANCE_KM', 'RELATIVE_VELOCITY_KM_S', 'ALTITUDE_KM'):
+                row[field] = f"{row[field]:.3f}"
+            writer.writerow(row)
+    print(f"✅ {len(conjunctions)} conjunciones guardadas: {path}")
+
+
+# ---------------------------------------------------------------------------
+# Benchmark de escalado
+# ---------------------------------------------------------------------------
+
+def benchmark(records, start, end, max_workers, partition=PARTITION_BOTH, units_per_worker=4,
+              step=DEFAULT_STEP, threshold=DEFAULT_THRESHOLD):
+    """Tiempo, speedup y eficiencia con 1, 2, 4, ... max_workers procesos"""
+    worker_counts = []
+    workers = 1
+    while workers < max_workers:
+        worker_counts.append(workers)
+        workers *= 2
+    worker_counts.append(max_workers)
+
+    # Las mismas unidades para todas las corridas: igual trabajo total
+    target_units = max_workers * units_per_worker
+    if partition == PARTITION_ALTITUDE:
+        units = plan_units(records, start, end, partition, bands=target_units, step=step, threshold=threshold)
+    elif partition == PARTITION_TIME:
+        units = plan_units(records, start, end, partition, slabs=target_units, step=step, threshold=threshold)
+    else:
+        slabs = max(2, int(math.sqrt(target_units)))
+        units = plan_units(records, start, end, partition, bands=max(1, target_units // slabs),
+                           slabs=slabs, step=step, threshold=threshold)
+
+    rows = []
+    reference = None
+    baseline = None
+    for workers in worker_counts:
+        started = time.perf_counter()
+        results = run_units(units, workers)
+        elapsed = time.perf_counter() - started
+        conjunctions = merge_conjunctions([r['conjunctions'] for r in results], step)
+        if reference is None:
+            reference, baseline = len(conjunctions), elapsed
+        elif len(conjunctions) != reference:
+            print(f"⚠️ {workers} workers: {len(conjunctions)} conjunciones (esperadas {reference})")
+        rows.append({
+            'workers': workers,
+            'seconds': elapsed,
+            'speedup': baseline / elapsed,
+            'efficiency': baseline / elapsed / workers,
+            'conjunctions': len(conjunctions)
+        })
+
+    print("\n" + "=" * 60)
+    print(f"📈 ESCALADO: {len(records)} objetos, {len(units)} unidades ({partition})")
+    print("=" * 60)
+    print(f"{'workers':>8}{'segundos':>12}{'speedup':>10}{'eficiencia':>12}{'conj.':>8}")
+    for row in rows:
+        print(f"{row['workers']:>8}{row['seconds']:>12.2f}{row['speedup']:>10.2f}"
+              f"{row['efficiency']:>12.0%}{row['conjunctions']:>8}")
+    print("=" * 60)
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _window(args):
+    start = args.start.timestamp() if args.start else time.time()
+    return start, start + args.hours * 3600
+
+
+def _add_window_args(parser):
+    parser.add_argument("--catalog", help="Directorio datos_criticos_* (por defecto el más reciente)")
+    parser.add_argument("--start", type=lambda s: datetime.fromisoformat(s).replace(tzinfo=timezone.utc),
+                        help="Inicio de la ventana en UTC (por defecto ahora)")
+    parser.add_argument("--hours", type=float, default=24, help="Duración de la ventana")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP, help="Segundos entre muestras")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Distancia de reporte (km)")
+    parser.add_argument("--partition", choices=PARTITIONS, default=PARTITION_ALTITUDE)
+    parser.add_argument("--bands", type=int, default=16, help="Bandas de altitud")
+    parser.add_argument("--slabs", type=int, default=4, help="Franjas de tiempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screening de conjunciones paralelo")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Screening en un pool de procesos local")
+    _add_window_args(run_parser)
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    run_parser.add_argument("--output", default="conjunciones.csv")
+
+    plan_parser = commands.add_parser("plan", help="Encolar unidades para varios nodos")
+    _add_window_args(plan_parser)
+    plan_parser.add_argument("--queue", required=True, help="Directorio compartido de la cola")
+
+    worker_parser = commands.add_parser("worker", help="Procesar unidades de la cola")
+    worker_parser.add_argument("--queue", required=True)
+    worker_parser.add_argument("--requeue-after", type=float,
+                               help=f"Reencolar reclamos sin renovar en estos segundos (> {CLAIM_HEARTBEAT:.0f})")
+    worker_parser.add_argument("--wait", action="store_true", help="Esperar hasta que termine todo el plan")
+
+    merge_parser = commands.add_parser("merge", help="Fusionar resultados de la cola")
+    merge_parser.add_argument("--queue", required=True)
+    merge_parser.add_argument("--output", default="conjunciones.csv")
+
+    bench_parser = commands.add_parser("benchmark", help="Medir escalado con 1..N procesos")
+    _add_window_args(bench_parser)
+    bench_parser.add_argument("--synthetic", type=int, help="Usar N objetos sintéticos en lugar del catálogo")
+    bench_parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    bench_parser.add_argument("--json-out", help="Guardar resultados en JSON")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        records = load_catalog(args.catalog)
+        start, end = _window(args)
+        units = plan_units(records, start, end, args.partition, args.bands, args.slabs,
+                           args.step, args.threshold)
+        started = time.perf_counter()
+        results = run_units(units, args.workers)
+        conjunctions = merge_conjunctions([r['conjunctions'] for r in results], args.step)
+        print(f"⏱️ Screening completado en {time.perf_counter() - started:.1f}s con {args.workers} procesos")
+        write_conjunctions(args.output, conjunctions)
+
+    elif args.command == "plan":
+        records = load_catalog(args.catalog)
+        start, end = _window(args)
+        enqueue_units(args.queue, plan_units(records, start, end, args.partition, args.bands,
+                                             args.slabs, args.step, args.threshold))
+
+    elif args.command == "worker":
+        run_worker(args.queue, args.requeue_after, args.wait)
+
+    elif args.command == "merge":
+        results, missing, step = collect_results(args.queue)
+        if missing:
+            print(f"⚠️ Faltan {len(missing)} unidades: {', '.join(missing[:10])}")
+        write_conjunctions(args.output, merge_conjunctions([r['conjunctions'] for r in results], step))
+        if missing:
+            sys.exit(1)
+
+    elif args.command == "benchmark":
+        if args.synthetic:
+            records = synthetic_catalog(args.synthetic)
+        else:
+            records = load_catalog(args.catalog)
+        start, end = _window(args)
+        rows = benchmark(records, start, end, args.max_workers, args.partition,
+                         step=args.step, threshold=args.threshold)
+        if args.json_out:
+            with open(args.json_out, 'w', encoding='utf-8') as f:
+                json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Capa de serialización de respuestas JSON
+Serializa una sola vez por snapshot los payloads más pedidos (CDM, estadísticas,
+TLE por objeto), guarda los bytes y su versión gzip, y responde 304 a las
+peticiones condicionales. El costo por petición no depende del tamaño del payload.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+
+from fastapi import Request, Response
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Por debajo de este tamaño gzip no compensa
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+
+def dumps(payload):
+    """Serializar a bytes JSON con el codificador más rápido disponible"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class CachedBody:
+    """Cuerpo JSON serializado con su variante gzip y su ETag"""
+
+    def __init__(self, body):
+        self.body = body
+        # ETag derivado del contenido: la generación es un contador por proceso
+        # que se reinicia al arrancar y difiere entre workers
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.gzip_body = None
+        if len(body) >= GZIP_MIN_SIZE:
+            compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            if len(compressed) < len(body):
+                self.gzip_body = compressed
+
+
+class ResponseCache:
+    """Cuerpos serializados del snapshot vigente, indexados por clave"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = {}
+
+    def get(self, snapshot, key, builder):
+        """Cuerpo cacheado de 'key', construyéndolo con builder(snapshot) si falta"""
+        entries = self._entries_for(snapshot.generation)
+        cached = entries.get(key)
+        if cached is None:
+            cached = CachedBody(dumps(builder(snapshot)))
+            entries[key] = cached
+        return cached
+
+    def warm(self, snapshot, builders):
+        """Precalcular varios payloads de un snapshot recién publicado"""
+        for key, builder in builders.items():
+            self.get(snapshot, key, builder)
+
+    def _entries_for(self, generation):
+        """Entradas de una generación; al cambiar de generación se descartan las previas"""
+        with self._lock:
+            if self._generation != generation:
+                if self._generation is not None and generation < self._generation:
+                    # Petición que llegó con un snapshot ya reemplazado
+                    return {}
+                self._generation = generation
+                self._entries = {}
+            return self._entries
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    # Comparación débil: ignorar el prefijo W/
+    weak = etag[2:] if etag.startswith('W/') else etag
+    return any((tag[2:] if tag.startswith('W/') else tag) == weak for tag in candidates)
+
+
+def cached_json_response(request: Request, cached: CachedBody, max_age=0):
+    """Respuesta JSON desde un cuerpo cacheado, con 304 y gzip según la petición"""
+    headers = {
+        "ETag": cached.etag,
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding"
+    }
+
+    if _etag_matches(request.headers.get('if-none-match'), cached.etag):
+        return Response(status_code=304, headers=headers)
+
+    body = cached.body
+    if cached.gzip_body is not None and 'gzip' in request.headers.get('accept-encoding', ''):
+        body = cached.gzip_body
+        headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def json_response(payload, status_code=200):
+    """Respuesta JSON no cacheable serializada con el codificador rápido"""
+    return Response(content=dumps(payload), status_code=status_code, media_type="application/json")
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,218 @@
+"""
+Capa de servicio de snapshots
+Mantiene en memoria la última extracción publicada para que los endpoints
+de lectura respondan siempre con datos precalculados, sin esperar extracciones
+"""
+
+import os
+import csv
+import json
+import glob
+import shutil
+import threading
+import time
+from datetime import datetime
+
+SNAPSHOT_DIR_PATTERN = "datos_criticos_*"
+# Directorios temporales de EssentialExtractor.save_data
+SNAPSHOT_TMP_PATTERN = f".{SNAPSHOT_DIR_PATTERN}.tmp"
+
+# Archivos CSV de una extracción y la clave con la que se sirven
+SNAPSHOT_CSV_FILES = {
+    'active_tle': "tle_activos.csv",
+    'debris_tle': "tle_basura_espacial.csv",
+    'critical_cdm': "cdm_criticos.csv"
+}
+
+
+def risk_stats(critical_cdm, total_records):
+    """Clasificación de CDM críticos por probabilidad de colisión"""
+    high_risk = [cdm for cdm in critical_cdm if float(cdm.get('PC') or 0) > 0.01]
+    medium_risk = [cdm for cdm in critical_cdm if 0.001 < float(cdm.get('PC') or 0) <= 0.01]
+    return {
+        "high_risk": len(high_risk),
+        "medium_risk": len(medium_risk),
+        "low_risk": len(critical_cdm) - len(high_risk) - len(medium_risk),
+        "total": total_records
+    }
+
+
+class Snapshot:
+    """Extracción publicada e inmutable"""
+
+    def __init__(self, directory, metadata, files, generation, records=None):
+        self.directory = directory
+        self.metadata = metadata
+        self.files = files
+        self.generation = generation
+        self.records = records or {key: [] for key in SNAPSHOT_CSV_FILES}
+        self.tle_by_id = {}
+        for key in ('active_tle', 'debris_tle'):
+            for record in self.records[key]:
+                self.tle_by_id[record.get('NORAD_CAT_ID', '')] = record
+        self.stats = risk_stats(
+            self.records['critical_cdm'],
+            metadata.get('total_records', sum(len(r) for r in self.records.values()))
+        )
+        self.complete = is_complete(metadata)
+        self.created_at = self._resolve_created_at(directory, metadata)
+        self.published_at = time.time()
+
+    @staticmethod
+    def _resolve_created_at(directory, metadata):
+        """Momento de la extracción (epoch) según metadata o fecha del directorio"""
+        extraction_time = metadata.get('extraction_time')
+        if extraction_time:
+            try:
+                return datetime.fromisoformat(extraction_time).timestamp()
+            except ValueError:
+                pass
+        return os.path.getctime(directory)
+
+    @classmethod
+    def load(cls, directory, generation):
+        """Cargar un snapshot desde un directorio datos_criticos_*"""
+        metadata = read_metadata(directory)
+
+        files = []
+        for file_path in sorted(glob.glob(f"{directory}/*")):
+            if os.path.isfile(file_path):
+                files.append({
+                    "name": os.path.basename(file_path),
+                    "size": os.path.getsize(file_path),
+                    "path": file_path
+                })
+
+        # Cargar los registros en memoria para servirlos sin tocar disco
+        records = {}
+        for key, filename in SNAPSHOT_CSV_FILES.items():
+            records[key] = []
+            csv_file = os.path.join(directory, filename)
+            if os.path.exists(csv_file):
+                with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+                    records[key] = list(csv.DictReader(f))
+
+        return cls(directory, metadata, files, generation, records)
+
+    def age_seconds(self):
+        """Antigüedad de los datos en segundos"""
+        return max(0.0, time.time() - self.created_at)
+
+    def file_path(self, filename):
+        """Ruta de un archivo del snapshot, o None si no pertenece a él"""
+        for file_info in self.files:
+            if file_info["name"] == filename:
+                return file_info["path"]
+        return None
+
+    def headers(self):
+        """Cabeceras HTTP de frescura del snapshot"""
+        age = int(self.age_seconds())
+        return {
+            "X-Snapshot-Age": str(age),
+            "X-Snapshot-Generation": str(self.generation),
+            "X-Snapshot-Complete": "true" if self.complete else "false",
+            "X-Snapshot-Time": datetime.fromtimestamp(self.created_at).isoformat(),
+            "X-Snapshot-Directory": self.directory
+        }
+
+
+class SnapshotStore:
+    """Contenedor del snapshot vigente con publicación atómica"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = None
+        self._generation = 0
+        self._listeners = []
+
+    def current(self):
+        """Snapshot vigente (lectura sin bloqueo)"""
+        return self._current
+
+    def add_listener(self, callback):
+        """Registrar callback(previo, nuevo) a invocar en cada publicación"""
+        self._listeners.append(callback)
+
+    def publish(self, directory):
+        """Cargar y publicar un directorio de extracción como snapshot vigente"""
+        with self._lock:
+            generation = self._generation + 1
+            snapshot = Snapshot.load(directory, generation)
+            previous = self._current
+            # El intercambio de referencia es atómico: los lectores ven el
+            # snapshot anterior completo o el nuevo completo
+            self._current = snapshot
+            self._generation = generation
+
+        for callback in list(self._listeners):
+            try:
+                callback(previous, snapshot)
+            except Exception as e:
+                print(f"❌ Error notificando publicación de snapshot: {e}")
+
+        print(f"✅ Snapshot publicado: {directory} (generación {generation})")
+        return snapshot
+
+    def load_latest(self):
+        """Publicar la extracción completa más reciente en disco, si existe
+
+        Sin extracciones completas se publica la más reciente.
+        """
+        directory = latest_snapshot_dir(complete_only=True) or latest_snapshot_dir()
+        if directory is None:
+            return None
+        return self.publish(directory)
+
+
+def read_metadata(directory):
+    """metadata.json de un directorio de extracción ({} si no existe)"""
+    metadata_file = os.path.join(directory, "metadata.json")
+    if not os.path.exists(metadata_file):
+        return {}
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_complete(metadata):
+    """Todas las consultas de la extracción terminaron sin rangos fallidos
+
+    Las extracciones anteriores a la descarga por rangos no registran
+    'complete' y se consideran completas.
+    """
+    return bool(metadata.get('complete', True))
+
+
+def snapshot_created_at(directory):
+    """Momento de la extracción de un directorio, sin cargar sus CSV"""
+    return Snapshot._resolve_created_at(directory, read_metadata(directory))
+
+
+def latest_snapshot_dir(complete_only=False):
+    """Directorio de extracción más reciente en disco"""
+    data_dirs = [d for d in glob.glob(SNAPSHOT_DIR_PATTERN) if os.path.isdir(d)]
+    if complete_only:
+        data_dirs = [d for d in data_dirs if is_complete(read_metadata(d))]
+    if not data_dirs:
+        return None
+    return max(data_dirs, key=os.path.getctime)
+
+
+def prune_snapshots(keep, protected=()):
+    """Borrar extracciones antiguas y temporales de extracciones interrumpidas
+
+    Conserva los 'keep' directorios más recientes y los de 'protected'.
+    Solo debe llamarse con el candado de extracción tomado: con él, ningún
+    directorio temporal pertenece a una extracción en curso.
+    """
+    data_dirs = sorted((d for d in glob.glob(SNAPSHOT_DIR_PATTERN) if os.path.isdir(d)),
+                       key=os.path.getctime, reverse=True)
+    stale = [d for d in data_dirs[max(keep, 1):] if d not in protected]
+    stale += [d for d in glob.glob(SNAPSHOT_TMP_PATTERN) if os.path.isdir(d)]
+    for directory in stale:
+        shutil.rmtree(directory, ignore_errors=True)
+        print(f"🗑️ Extracción antigua eliminada: {directory}")
+    return stale
+
+
+store = SnapshotStore()